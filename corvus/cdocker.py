@@ -6,33 +6,149 @@ REF https://docker-py.readthedocs.io/
 __author__ = "Alexander Gorelyshev"
 __email__ = "alexander.gorelyshev@pm.me"
 
+import atexit
 import logging
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, Tuple
 
-import docker  # type: ignore
-from docker.errors import ImageNotFound  # type: ignore
+if TYPE_CHECKING:
+    import docker  # type: ignore
 
 
-def image_exists(name: str, tag: str, logger: logging.LoggerAdapter = None) -> bool:
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _client() -> "docker.DockerClient":
     """
-    Check if a Docker image with a given `name`:`tag` combination exists.
+    Return a process-wide Docker client, creating it on first use.
 
-    :param name: image name
-    :param tag: image tag (e.g., version, "latest", etc.)
-    :param logger: logging.LoggerAdapter instance
-    :return: True if the image exists, False otherwise
+    The client (and its HTTP session to the daemon) is reused by every helper
+    in this module and closed at interpreter exit.
+
+    :return: a docker.DockerClient instance
+    """
+    global _CLIENT
+
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                ## Deferred import: the Docker SDK is a sizeable import tree
+                import docker  # type: ignore
+                _CLIENT = docker.from_env()
+                atexit.register(_CLIENT.close)
+
+    return _CLIENT
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+class _ImageIndex:
+    """
+    Process-local {"name:tag" -> labels} index of the local Docker images.
+
+    The index is built from a single image listing and rebuilt lazily after
+    the daemon reports an image event (pull, tag, untag, delete, ...), which
+    a background thread watches for.
     """
-    dclient = docker.client.from_env()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels: Dict[str, dict] = {}
+        self._stale = True
+        self._watcher = None
+
+    def _watch(self, stream) -> None:
+        """Mark the index stale on every image event until the stream ends."""
+        try:
+            for _ in stream:
+                self._stale = True
+        except Exception:  # daemon went away or the client was closed
+            pass
+        finally:
+            self._watcher = None
+            self._stale = True
+
+    def get(self) -> Dict[str, dict]:
+        """
+        Return the current index, (re)building it if needed.
+
+        :return: a {"name:tag" -> labels} mapping
+        """
+        with self._lock:
+            if self._watcher is None:
+                ## Subscribe before listing, so no event between the two goes unnoticed
+                stream = _client().events(filters={"type": "image"}, decode=True)
+                self._watcher = threading.Thread(target=self._watch, args=(stream,), name="corvus-docker-events", daemon=True)
+                self._watcher.start()
+                self._stale = True
+
+            if self._stale:
+                self._stale = False
+                self._labels = {
+                    tag: summary.get("Labels") or {}
+                    for summary in _client().api.images()
+                    for tag in (summary.get("RepoTags") or [])
+                }
+
+            return self._labels
+
+
+_IMAGE_INDEX = _ImageIndex()
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _image_resolves(ref: str) -> bool:
+    """Ask the daemon whether `ref` names a local image, however it is spelled."""
+    from docker.errors import ImageNotFound  # type: ignore
 
     try:
-        _ = dclient.images.get(f"{name}:{tag or 'latest'}")
+        _client().images.get(ref)
     except ImageNotFound:
-        if logger:
-            logger.error(f"Docker image not available: '{name}:{tag}'")
         return False
 
     return True
 
 
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def images_exist(refs: Iterable[Tuple[str, str]], logger: logging.LoggerAdapter = None) -> Dict[str, bool]:
+    """
+    Check a batch of `name`:`tag` combinations against the index of local images.
+    Misses are asked of the daemon one by one, which covers events not processed yet and
+    references that are not spelled as in RepoTags (e.g., "docker.io/library/busybox");
+    an image removed a moment ago may still be reported until its event arrives.
+
+    :param refs: (name, tag) pairs; an empty tag stands for "latest"
+    :param logger: logging.LoggerAdapter instance
+    :return: a {"name:tag" -> exists} mapping
+    """
+    wanted = [(name, tag, f"{name}:{tag or 'latest'}") for name, tag in refs]
+
+    index = _IMAGE_INDEX.get()
+
+    result = {}
+    for name, tag, ref in wanted:
+        result[ref] = ref in index or _image_resolves(ref)
+        if not result[ref] and logger:
+            logger.error("Docker image not available: '%s:%s'", name, tag)
+
+    return result
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def image_exists(name: str, tag: str, logger: logging.LoggerAdapter = None) -> bool:
+    """
+    Check if a Docker image with a given `name`:`tag` combination exists.
+
+    :param name: image name
+    :param tag: image tag (e.g., version, "latest", etc.)
+    :param logger: logging.LoggerAdapter instance
+    :return: True if the image exists, False otherwise
+    """
+    return images_exist([(name, tag)], logger=logger)[f"{name}:{tag or 'latest'}"]
+
+
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def get_image_labels(name: str, tag: str) -> dict:
     """
@@ -41,6 +157,12 @@ def get_image_labels(name: str, tag: str) -> dict:
     :param name: image name
     :param tag: image tag
     :return: a dictionary of Docker image labels
+    :raises: docker.errors.ImageNotFound
     """
-    dclient = docker.from_env()
-    return dclient.images.get(f"{name}:{tag or 'latest'}").labels
+    ref = f"{name}:{tag or 'latest'}"
+
+    labels = _IMAGE_INDEX.get().get(ref)
+    if labels is None:
+        labels = _client().images.get(ref).labels
+
+    return dict(labels)
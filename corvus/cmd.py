@@ -5,31 +5,74 @@ __email__ = "alexander.gorelyshev@pm.me"
 
 
 import asyncio
+import io
 import logging
 import os
 import subprocess
 import sys
-from typing import Union
+import tempfile
+from contextlib import ExitStack
+from typing import List, Optional, Union
 
-import magic  # type: ignore
-from humanfriendly import format_size  # type: ignore
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+## Capture destination (alongside subprocess.PIPE/DEVNULL): spool the stream to a temporary file
+TEMPFILE = -10
+
+## Binary (1024-based) units used by `_format_size`
+SIZE_UNITS = ("B", "KiB", "MiB", "GiB", "TiB", "PiB")
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
-def get_cmd_output(cmd: str) -> dict:
-    """Run a shell command via subprocess and return exit code and stdout/stderr.
-    :param cmd: shell command as a string (supports redirects, wildcards, etc.)
-    :returns: a dictionary with return code, stdout and stderr
+def get_cmd_output(
+        cmd: Union[str, List[str]],
+        *,
+        shell: Optional[bool] = None,
+        stdout_to: int = subprocess.PIPE,
+        stderr_to: int = subprocess.PIPE
+) -> dict:
+    """Run a command via subprocess and return exit code and stdout/stderr.
+    A string is a shell command (redirects, wildcards, builtins, etc. work as usual);
+    an argv list is executed directly, skipping the intermediate /bin/sh.
+    :param cmd: an argv list or a shell command as a string
+    :param shell: (optional) override the choice of execution through the shell [True for strings, False for lists]
+    :param stdout_to: (optional) subprocess.PIPE, subprocess.DEVNULL or TEMPFILE for large outputs [PIPE]
+    :param stderr_to: (optional) subprocess.PIPE, subprocess.DEVNULL or TEMPFILE [PIPE]
+    :returns: a dictionary with return code, stdout and stderr (empty for discarded streams)
     """
-    proc = subprocess.run(
-        cmd,
-        shell=True,
-        capture_output=True,
-        text=True,
-        check=False
-    )
-
-    return {"rc": proc.returncode, "stdout": proc.stdout.strip(), "stderr": proc.stderr.strip()}
+    if shell is None:
+        shell = isinstance(cmd, str)
+
+    with ExitStack() as stack:
+        ## Swap TEMPFILE markers for actual (auto-removed) temporary files
+        targets = [
+            stack.enter_context(tempfile.TemporaryFile("w+", encoding="utf-8")) if target == TEMPFILE else target
+            for target in (stdout_to, stderr_to)
+        ]
+
+        try:
+            proc = subprocess.run(
+                cmd,
+                shell=shell,
+                stdout=targets[0],
+                stderr=targets[1],
+                bufsize=-1,
+                text=True,
+                check=False
+            )
+        except OSError as error:
+            ## Mimic the shell's "not executable" / "command not found" outcomes for directly executed argvs
+            rc = 126 if isinstance(error, PermissionError) else 127
+            return {"rc": rc, "stdout": "", "stderr": str(error)}
+
+        streams = []
+        for target, captured in zip(targets, (proc.stdout, proc.stderr)):
+            if isinstance(target, io.TextIOBase):
+                target.seek(0)
+                captured = target.read()
+            streams.append((captured or "").strip())
+
+    return {"rc": proc.returncode, "stdout": streams[0], "stderr": streams[1]}
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
@@ -53,6 +96,45 @@ async def get_cmd_output_async(cmd: str) -> dict:
     return {"rc": proc.returncode, "stdout": stdout, "stderr": stderr}
 
 
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+async def get_cmd_output_exec_async(argv: List[str]) -> dict:
+    """Run an asynchronous command directly (no /bin/sh in between) and return exit code and stdout/stderr.
+    :param argv: the executable followed by its arguments
+    :returns: a dictionary with return code, stdout and stderr
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+    except OSError as error:
+        ## Mimic the shell's "command not found" outcome
+        return {"rc": 127, "stdout": "", "stderr": str(error)}
+
+    stdout_b, stderr_b = await proc.communicate()
+
+    stdout = stdout_b.decode("utf-8")
+    stderr = stderr_b.decode("utf-8")
+
+    return {"rc": proc.returncode, "stdout": stdout, "stderr": stderr}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _format_size(size_bytes: int) -> str:
+    """Return a human-readable file size, e.g. '512 B' or '1.50 MiB'."""
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+
+    size = float(size_bytes)
+    unit = 0
+    while size >= 1024 and unit < len(SIZE_UNITS) - 1:
+        size /= 1024
+        unit += 1
+
+    return f"{size:.2f} {SIZE_UNITS[unit]}"
+
+
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def make_path_comment(path: str, message: str, logger: logging.LoggerAdapter, work_magic: bool = False, caller_funcname: bool = False) -> Union[str, None]:
     """Build a comment on a path, including size, other (optional) info and attach a message.
@@ -64,22 +146,25 @@ def make_path_comment(path: str, message: str, logger: logging.LoggerAdapter, wo
     :returns: string comment containing requested bits of info plus the user-defined message
     """
     try:
-        size_bytes = os.stat(path).st_size
-        size = format_size(size_bytes)
-        # size = f"{int(size_bytes / 1024)} kB" if size_bytes >= 1024 else f"{size_bytes} B"
+        size = _format_size(os.stat(path).st_size)
 
         if work_magic:
-            with open(path, "rb") as file:
-                description = magic.from_buffer(file.read(2048))
+            ## Deferred import: libmagic bindings are only needed here
+            import magic  # type: ignore
 
-        output = f"{message} ({size}, {description}): '{path}'"
+            ## The head of the file is enough for libmagic; from_file would read much more, and not follow symlinks
+            with open(path, "rb") as file:
+                details = f"{size}, {magic.from_buffer(file.read(2048))}"
+        else:
+            details = size
+        output = f"{message} ({details}): '{path}'"
 
         if caller_funcname:
             caller = sys._getframe(1).f_code.co_name
             output = f"({caller}) " + output if caller_funcname else output
 
     except Exception as error:
-        logger.error(f"{repr(error)}: '{path}'")
+        logger.error("%r: '%s'", error, path)
         output = ""
 
     return output
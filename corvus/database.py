@@ -1,22 +1,33 @@
 """Functions that ease the pain of working with databases (primarily PostgreSQL)."""
 
+import functools
 import logging
+import os
 import sys
 from collections import namedtuple
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
-import pandas as pd
 import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from corvus.cmd import get_cmd_output
+from corvus.cmd import TEMPFILE, get_cmd_output
 
 
 ## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
 QueryCriterion = namedtuple("QueryCriterion", ("column", "value"))
 ORMPrimaryKey = namedtuple("ORMPrimaryKey", ("attribute", "value"))
 
+## Field order of a .pgpass line (hostname:port:database:username:password)
+PGPASS_FIELDS = ("db_host", "db_port", "db_name", "db_user", "db_password")
+
+## Dialects with a native INSERT ... ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert
+}
+
 
 ## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
 def get_pg_entity_names(engine: sqlalchemy.engine.Engine, entity: str) -> List[str]:
@@ -37,36 +48,72 @@ def get_pg_entity_names(engine: sqlalchemy.engine.Engine, entity: str) -> List[s
     """)
 
     with engine.connect() as conn:
-        return pd.read_sql(select, con=conn).squeeze().tolist()
+        return [row[0] for row in conn.execute(select)]
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 ## TODO: rework as a normal Docker SDK call
 def backup_db(service_name: str, logger: logging.LoggerAdapter) -> None:
-    logger.info(f"Running PostgreSQL backup via a Docker Compose service: {service_name}")
+    logger.info("Running PostgreSQL backup via a Docker Compose service: %s", service_name)
 
-    cmd = f"docker exec {service_name} /backup.sh"
-    logger.debug(f"CMD: '{cmd}'")
+    cmd = ["docker", "exec", service_name, "/backup.sh"]
+    logger.debug("CMD: '%s'", " ".join(cmd))
 
-    output = get_cmd_output(cmd)
+    output = get_cmd_output(cmd, stdout_to=TEMPFILE)
     if output["rc"]:
-        logger.error(f"(docker-compose:{service_name}) [stderr] {output['stderr']}")
+        logger.error("(docker-compose:%s) [stderr] %s", service_name, output["stderr"])
+
+    last_message = output["stdout"].rsplit("\n", 1)[-1].strip()
+
+    logger.debug("(docker-compose:%s) [stdout] %s", service_name, last_message)
 
-    last_message = [line.strip() for line in output["stdout"]][-1]
 
-    logger.debug(f"(docker-compose:{service_name}) [stdout] {last_message}")
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@functools.lru_cache(maxsize=256)
+def _exists_query(table_name: str, column_name: str) -> sqlalchemy.sql.Select:
+    """
+    Build (once per table/column pair) a ``SELECT EXISTS(...)`` statement with a ``:value`` bound parameter.
+
+    :param table_name: name of the table to query
+    :param column_name: name of the column to compare against ``:value``
+    :return: a reusable sqlalchemy.sql.Select statement
+    """
+    ## Identifiers are quoted by SQLAlchemy; the statement shape stays cacheable across calls
+    return (
+        sqlalchemy.exists()
+        .where(sqlalchemy.column(column_name) == sqlalchemy.bindparam("value"))
+        .select_from(sqlalchemy.table(table_name))
+        .select()
+    )
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
-def row_exists(table_name: str, criterion: QueryCriterion, engine: sqlalchemy.engine.Engine, logger: logging.LoggerAdapter) -> bool:
+def row_exists(
+        table_name: str,
+        criterion: QueryCriterion,
+        engine: sqlalchemy.engine.Engine,
+        logger: logging.LoggerAdapter,
+        conn: Optional[sqlalchemy.engine.Connection] = None
+) -> bool:
+    """
+    Check if a table has at least one row with `criterion.column` equal to `criterion.value`.
+
+    :param table_name: name of the table to query
+    :param criterion: a (column, value) namedtuple
+    :param engine: a SQLAlchemy engine (a connection factory)
+    :param logger: a logging.LoggerAdapter instance
+    :param conn: (optional) an open connection to reuse instead of checking out a new one
+    :return: True if a matching row exists, False otherwise (incl. database errors)
+    """
+    query = _exists_query(table_name, criterion.column)
+
     try:
-        query = sqlalchemy.text(f"""SELECT exists(SELECT 1 FROM "{table_name}" WHERE "{criterion.column}" = :value);""")
-        with engine.connect() as conn:
-            return bool(
-                conn.execute(query, value=criterion.value).fetchone()[0]
-            )
+        if conn is not None:
+            return bool(conn.execute(query, {"value": criterion.value}).scalar())
+        with engine.connect() as conn_:
+            return bool(conn_.execute(query, {"value": criterion.value}).scalar())
     except Exception as error:
-        logger.error(f"({criterion}) Error accessing database: {error}")
+        logger.error("(%s) Error accessing database: %s", criterion, error)
         return False
 
 
@@ -86,6 +133,19 @@ WHERE i.indrelid = '"{table_name}"'::regclass
         return conn.execute(query).fetchone()[0]
 
 
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@functools.lru_cache(maxsize=8)
+def _get_engine(db_url: str, **kwargs) -> sqlalchemy.engine.Engine:
+    """
+    Create a SQLAlchemy engine once per URL (and options), so that the process keeps a single pool per database.
+
+    :param db_url: database URL
+    :param kwargs: extra keyword arguments for sqlalchemy.create_engine()
+    :return: sqlalchemy.engine.Engine instance
+    """
+    return sqlalchemy.create_engine(db_url, pool_pre_ping=True, pool_recycle=1800, **kwargs)
+
+
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def get_pg_engine(path_pgpass: str, application_name: str = "", logger: logging.LoggerAdapter = None) -> sqlalchemy.engine.Engine:
     """
@@ -100,20 +160,40 @@ def get_pg_engine(path_pgpass: str, application_name: str = "", logger: logging.
     params = {k.strip(): v for k, v in db_settings.copy().items() if k != "db_password"}
 
     if logger:
-        logger.debug(f"DB connection parameters: {params}")
+        logger.debug("DB connection parameters: %s", params)
 
     db_url = "postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}?application_name={application_name}".format(
         application_name=application_name,
         **db_settings
     )
-    return sqlalchemy.create_engine(db_url, client_encoding="utf8")
+    return _get_engine(db_url, client_encoding="utf8")
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def get_sqlite_engine(db_path: str, logger: logging.LoggerAdapter) -> sqlalchemy.engine.Engine:
     db_url = f"sqlite:///{db_path}"
-    logger.debug(f"Attempting to connect using database URL: '{db_url}'")
-    return sqlalchemy.create_engine(db_url)
+    logger.debug("Attempting to connect using database URL: '%s'", db_url)
+    return _get_engine(db_url)
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@functools.lru_cache(maxsize=8)
+def _read_pgpass(path: str, mtime_ns: int) -> Tuple[str, ...]:
+    """
+    Split a .pgpass file into its fields, memoized on the path and modification time.
+
+    :param path: location of the .pgpass file
+    :param mtime_ns: modification time of the file (only serves as a part of the cache key)
+    :return: a (host, port, database, user, password) tuple
+    :raises: OSError, ValueError
+    """
+    with open(path, "r", encoding="ascii") as file:
+        fields = tuple(file.read().strip().split(":"))
+
+    if len(fields) != len(PGPASS_FIELDS):
+        raise ValueError(f"expected {len(PGPASS_FIELDS)} fields, found {len(fields)}")
+
+    return fields
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
@@ -126,15 +206,7 @@ def parse_pgpass(path: str, logger: logging.LoggerAdapter = None) -> dict:
     :return: a dictionary of credentials
     """
     try:
-        with open(path, "r", encoding="ascii") as file:
-            db_host, db_port, db_name, db_user, db_password = file.read().strip().split(":")
-        return {
-            "db_host": db_host,
-            "db_port": db_port,
-            "db_name": db_name,
-            "db_user": db_user,
-            "db_password": db_password,
-        }
+        return dict(zip(PGPASS_FIELDS, _read_pgpass(path, os.stat(path).st_mtime_ns)))
     except Exception as error:
         err_message = f"Failed to parse the .pgpass file ({str(error)}): {path}"
         if logger:
@@ -144,10 +216,32 @@ def parse_pgpass(path: str, logger: logging.LoggerAdapter = None) -> dict:
         return {}
 
 
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _has_orm_side_effects(orm_cls) -> bool:
+    """
+    Tell if writing a row of ``orm_cls`` involves ORM machinery that a Core INSERT ... ON CONFLICT would skip:
+    ``Column.onupdate`` defaults, ``@validates`` hooks or mapper insert/update events.
+
+    :param orm_cls: class object, extending SQLAlchemy Base to represent a SQL table
+    :return: True if the row has to go through an ORM session
+    """
+    mapper = sqlalchemy.inspect(orm_cls)
+    dispatch = mapper.dispatch
+
+    return (
+        bool(mapper.validators)
+        or any(column.onupdate is not None for column in mapper.columns)
+        or any(map(bool, (dispatch.before_insert, dispatch.after_insert, dispatch.before_update, dispatch.after_update)))
+    )
+
+
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def upsert_orm(orm_cls, attributes: Dict[str, Any], engine: sqlalchemy.engine.Engine, pkey: ORMPrimaryKey, logger: logging.LoggerAdapter) -> Any:
     """
-    Emulate an UPSERT (UPdate/inSERT) operation for a row in an ORM-defined SQL table.
+    Run an UPSERT (UPdate/inSERT) operation for a row in an ORM-defined SQL table.
+    On PostgreSQL and SQLite this is a single ``INSERT ... ON CONFLICT DO UPDATE ... RETURNING`` statement;
+    other dialects, and tables with onupdate defaults, validators or mapper events, fall back to
+    an ORM-emulated SELECT followed by an INSERT or UPDATE.
 
     :param orm_cls: class object, extending SQLAlchemy Base to represent a SQL table
     :param attributes: {property_name->value} mapping to be setattr'ed on an instance of the ``orm_cls`` class
@@ -158,11 +252,49 @@ def upsert_orm(orm_cls, attributes: Dict[str, Any], engine: sqlalchemy.engine.En
     :raises: sqlalchemy.exc.IntegrityError, AttributeError
     """
 
-    logger.debug(f"Received an ORM object: '{orm_cls.__tablename__}' ({orm_cls.__name__})")
+    logger.debug("Received an ORM object: '%s' (%s)", orm_cls.__tablename__, orm_cls.__name__)
+
+    dialect_insert = UPSERT_INSERTS.get(engine.dialect.name)
+    if dialect_insert is None or _has_orm_side_effects(orm_cls):
+        return _upsert_orm_emulated(orm_cls, attributes, engine, pkey, logger)
+
+    logger.debug("Will upsert the following fields: %s", attributes)
+    try:
+        pkey_column = getattr(orm_cls, pkey.attribute)
+        ## An empty update set is not allowed; re-assigning the PK keeps RETURNING working on conflict
+        update = {getattr(orm_cls, key): value for key, value in attributes.items()} or {pkey_column: pkey.value}
+        values = dict(attributes, **({pkey.attribute: pkey.value} if pkey.value is not None else {}))
+
+        stmt = (
+            dialect_insert(orm_cls)
+            .values(**values)
+            .on_conflict_do_update(index_elements=[pkey_column], set_=update)
+            .returning(pkey_column)
+        )
+
+        with engine.begin() as conn:
+            returned_pkey = conn.execute(stmt).scalar_one()
+    except (IntegrityError, AttributeError) as error:
+        logger.error("Encountered an error during an ORM upsert (%r): '%s:%s'", error, pkey.attribute, pkey.value)
+        raise
+
+    logger.debug("Returned primary key ('%s'): %s", pkey.attribute, returned_pkey)
+
+    return returned_pkey
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _upsert_orm_emulated(orm_cls, attributes: Dict[str, Any], engine: sqlalchemy.engine.Engine, pkey: ORMPrimaryKey, logger: logging.LoggerAdapter) -> Any:
+    """
+    Emulate an UPSERT with an ORM SELECT, then an INSERT or UPDATE (for dialects without ON CONFLICT).
+
+    :returns: PK value of the upserted entity
+    :raises: sqlalchemy.exc.IntegrityError, AttributeError
+    """
     with engine.connect() as conn:
         session = Session(conn)
 
-        logger.debug(f"Making an ORM-relayed SELECT query with a primary key criterion: '{pkey.attribute}:{pkey.value}' ...")
+        logger.debug("Making an ORM-relayed SELECT query with a primary key criterion: '%s:%s' ...", pkey.attribute, pkey.value)
         instance = (
             session
             .query(orm_cls)
@@ -172,13 +304,13 @@ def upsert_orm(orm_cls, attributes: Dict[str, Any], engine: sqlalchemy.engine.En
 
         ## Found no row in the table with the given PK
         if not instance:
-            logger.debug(f"Entry not found, will run an INSERT operation: '{pkey.attribute}:{pkey.value}'")
+            logger.debug("Entry not found, will run an INSERT operation: '%s:%s'", pkey.attribute, pkey.value)
             instance = orm_cls(**{pkey.attribute: pkey.value})
         ## PK is already in the table
         else:
-            logger.debug(f"Entry discovered, will run an UPDATE operation: '{pkey.attribute}:{pkey.value}'")
+            logger.debug("Entry discovered, will run an UPDATE operation: '%s:%s'", pkey.attribute, pkey.value)
 
-        logger.debug(f"Will upsert the following fields: {attributes}")
+        logger.debug("Will upsert the following fields: %s", attributes)
         try:
             for key in attributes:
                 setattr(instance, key, attributes[key])
@@ -186,11 +318,11 @@ def upsert_orm(orm_cls, attributes: Dict[str, Any], engine: sqlalchemy.engine.En
             session.add(instance)
             session.commit()
         except (IntegrityError, AttributeError) as error:
-            logger.error(f"Encountered an error during an ORM upsert ({repr(error)}): '{pkey.attribute}:{pkey.value}'")
+            logger.error("Encountered an error during an ORM upsert (%r): '%s:%s'", error, pkey.attribute, pkey.value)
             raise
 
         session.refresh(instance)
         returned_pkey = getattr(instance, pkey.attribute)
-        logger.debug(f"Returned primary key ('{pkey.attribute}'): {returned_pkey}")
+        logger.debug("Returned primary key ('%s'): %s", pkey.attribute, returned_pkey)
 
     return returned_pkey
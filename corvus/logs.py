@@ -5,9 +5,25 @@ __email__ = "alexander.gorelyshev"
 
 import os
 import logging
+import logging.handlers
+import queue
 import sys
+import weakref
 
 from datetime import datetime as dt
+from typing import Dict, List, Tuple
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+LOG_FORMAT = "%(asctime)s | %(filename)-20s| line %(lineno)3d: [%(levelname)8s]  %(message)s"
+LOG_FORMAT_PID = "%(asctime)s | %(filename)-20s| line %(lineno)3d: [%(levelname)8s]  PID %(pid)-7s: %(message)s"
+DATE_FORMAT = "%d-%m-%Y %H:%M:%S"
+
+## logger name -> (arguments, queue handler, adapter) of the last `get_colored_logger` call that configured it
+_CONFIGURED: Dict[str, Tuple[tuple, logging.Handler, logging.LoggerAdapter]] = {}
+
+## Queue handlers alive in this process, to be reset in forked children
+_QUEUE_HANDLERS: "weakref.WeakSet[_LazyQueueHandler]" = weakref.WeakSet()
 
 
 ## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
@@ -19,32 +35,89 @@ class ColoredFormatter(logging.Formatter):
     ANSI_RED = "\u001b[31m"
     ANSI_RESET = "\u001b[0m"
 
+    ## Logging level -> color of the whole message; levels not listed are left uncolored
+    LEVEL_COLORS = {
+        logging.WARNING: ANSI_YELLOW,
+        logging.ERROR: ANSI_RED,
+        logging.CRITICAL: ANSI_RED,
+    }
+
     def __init__(self, fmt: str):
         super().__init__(
             fmt=fmt,
-            datefmt="%d-%m-%Y %H:%M:%S")
+            datefmt=DATE_FORMAT)
+
+        ## Colored variants of the user-configured format, built once per formatter
+        self._level_styles = {
+            levelno: logging.PercentStyle(f"{color}{fmt}{self.ANSI_RESET}")
+            for levelno, color in self.LEVEL_COLORS.items()
+        }
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        """Override the formatMessage function of logging.Formatter to support colour output.
+        The style is picked by logging level; no shared state is modified, so concurrent records are safe."""
+        return self._level_styles.get(record.levelno, self._style).format(record)
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues log records for the given handlers to format and write on a background thread.
+    The listener thread is only started with the first record, so that setting up a logger
+    before forking worker processes does not leave a thread behind in the parent."""
 
-    def format(self, record: logging.LogRecord) -> str:
-        """Override the format function of logging.Formatter to support colour output"""
+    def __init__(self, *handlers: logging.Handler):
+        super().__init__(queue.SimpleQueue())
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self._started = False
+        _QUEUE_HANDLERS.add(self)
 
-        ## Save the original format configured by the user when the logger
-        ## ...formatter was instantiated
-        format_orig = self._style._fmt
+    def emit(self, record: logging.LogRecord) -> None:
+        ## Called under the handler's lock (see logging.Handler.handle)
+        if not self._started:
+            self.listener.start()
+            self._started = True
 
-        ## Replace the original format with one customized by logging level
-        if record.levelno == logging.WARNING:
-            self._style._fmt = f"{self.ANSI_YELLOW}{format_orig}{self.ANSI_RESET}"
+        super().emit(record)
 
-        if record.levelno in (logging.ERROR, logging.CRITICAL):
-            self._style._fmt = f"{self.ANSI_RED}{format_orig}{self.ANSI_RESET}"
+    def _reset_after_fork(self) -> None:
+        """Swap in a fresh queue and a listener yet to be started (runs in forked children)."""
+        if self._started:
+            ## The parent's thread did not survive the fork, and its queue
+            ## ...may still hold records that the parent will write itself
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, *self.listener.handlers, respect_handler_level=True)
+            self._started = False
 
-        ## Call the original formatter class to do the grunt work
-        result = logging.Formatter.format(self, record)
+    def close(self) -> None:
+        """Drain the queue and close the wrapped handlers (also runs on interpreter exit via logging.shutdown)."""
+        self.acquire()
+        try:
+            if self._started:
+                self.listener.stop()
+            self._started = False
 
-        ## Restore the original format configured by the user
-        self._style._fmt = format_orig
+            for handler in self.listener.handlers:
+                handler.close()
+        finally:
+            self.release()
 
-        return result
+        super().close()
+
+
+def _reset_queue_handlers_after_fork() -> None:
+    """Reset every live queue handler once in a forked child, rather than checking the PID on every record."""
+    for handler in list(_QUEUE_HANDLERS):
+        handler._reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_queue_handlers_after_fork)
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+## Formatters keep no per-record state, so every handler can share the ones built here
+_FILE_FORMATTERS = {fmt: logging.Formatter(fmt, DATE_FORMAT) for fmt in (LOG_FORMAT, LOG_FORMAT_PID)}
+_COLORED_FORMATTERS = {fmt: ColoredFormatter(fmt=fmt) for fmt in (LOG_FORMAT, LOG_FORMAT_PID)}
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
@@ -57,6 +130,7 @@ def get_colored_logger(
         pid: bool = False
 ) -> logging.LoggerAdapter:
     """Instantiate a logger that colors messages based on their log level.
+    Repeated calls with the same arguments return the same adapter; other arguments reconfigure the logger.
     :param scriptname: name to be displayed as the origin for log messages
     :param log_dir: where to put log messages in the filesystem
     :param level: minimum level of messages to log (defaults to DEBUG)
@@ -65,40 +139,51 @@ def get_colored_logger(
     :param pid: whether to output IDs of the processes that generate messages
     :returns: a logging.LoggerAdapter instance
     """
-    fmt = "%(asctime)s | %(filename)-20s| line %(lineno)3d: [%(levelname)8s]  %(message)s"
-    extra = {}
+    fmt = LOG_FORMAT_PID if pid else LOG_FORMAT
+    extra = {"pid": os.getpid()} if pid else {}
+
+    logger = logging.getLogger(scriptname)
 
-    if pid:
-        fmt = "%(asctime)s | %(filename)-20s| line %(lineno)3d: [%(levelname)8s]  PID %(pid)-7s: %(message)s"
-        extra = {"pid": os.getpid()}
+    ## Asked for the configuration the logger already has: reuse it instead of rebuilding the handlers
+    key = (log_dir, level, to_stdout, persist, os.getpid() if pid else None)
+    cached = _CONFIGURED.get(scriptname)
+    if cached is not None and cached[0] == key and logger.handlers == [cached[1]]:
+        return cached[2]
 
     run_id = dt.strftime(dt.now(), "%d%m%Y-%H%M")
 
     if not os.path.isdir(log_dir):
         os.mkdir(log_dir)
 
-    logger = logging.getLogger(scriptname)
     logger.setLevel(level)
 
+    ## Release the files and the listener thread of our previous configuration (handlers attached by the caller are only detached)
+    if cached is not None:
+        cached[1].close()
     logger.handlers = []
 
     log_name = f"{os.path.splitext(os.path.basename(scriptname))[0]}.{run_id}.log"
     log_path = os.path.join(log_dir, log_name)
+    handlers: List[logging.Handler] = []
 
     ## Set up a file handler if user requested persistence mode
     if persist:
-        formatter = logging.Formatter(fmt, '%d-%m-%Y %H:%M:%S')
         fh = logging.FileHandler(log_path)
         fh.setLevel(logging.DEBUG)
-        fh.setFormatter(formatter)
-        logger.addHandler(fh)
+        fh.setFormatter(_FILE_FORMATTERS[fmt])
+        handlers.append(fh)
 
     ## Create a stream handler
     ch = logging.StreamHandler(sys.stdout) if to_stdout else logging.StreamHandler()
     ch.setLevel(level)
-    ch.setFormatter(ColoredFormatter(fmt=fmt))
-    logger.addHandler(ch)
+    ch.setFormatter(_COLORED_FORMATTERS[fmt])
+    handlers.append(ch)
+
+    ## Formatting and IO happen on a listener thread; logging calls only enqueue records
+    queue_handler = _LazyQueueHandler(*handlers)
+    logger.addHandler(queue_handler)
 
     adapter = logging.LoggerAdapter(logger, extra)  # SEE https://stackoverflow.com/a/17558764/15786420
+    _CONFIGURED[scriptname] = (key, queue_handler, adapter)
 
     return adapter
@@ -1,13 +1,21 @@
 """Miscellaneous utility functions."""
 
+import copy
+import functools
+import glob
+import importlib
 import json
 import logging
+import mmap
 import os
 import shutil
-from typing import Dict
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import xxhash
-import requests
 
 from corvus import cmd
 
@@ -48,6 +56,66 @@ ANSI_COLORS = {
 }
 
 
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _compose_ansi_prefix(name: str, bright: bool, bold: bool, reverse: bool) -> str:
+    """Build the escape sequence that `colorize` puts in front of the text."""
+    color = ANSI_COLORS[name]
+
+    if bright:
+        color = color.replace("m", ";1m")
+    if bold:
+        color = color + ANSI_COLORS["bold"]
+    if reverse:
+        color = color + ANSI_COLORS["reversed"]
+
+    return color
+
+
+## (name, bright, bold, reverse) -> escape sequence, for every combination
+ANSI_PREFIXES = {
+    (name, bright, bold, reverse): _compose_ansi_prefix(name, bright, bold, reverse)
+    for name in ANSI_COLORS
+    for bright in (False, True)
+    for bold in (False, True)
+    for reverse in (False, True)
+}
+
+ANSI_RESET = ANSI_COLORS["reset"]
+
+## Encoded once, for byte-oriented consumers (raw binary streams, log shippers)
+ANSI_PREFIXES_BYTES = {key: prefix.encode("ascii") for key, prefix in ANSI_PREFIXES.items()}
+ANSI_RESET_BYTES = ANSI_RESET.encode("ascii")
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+## Decimal representations of all byte values, for qtask_id2ascii
+BYTE_STRINGS = tuple(str(i) for i in range(256))
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+## Variant name -> (streaming hasher, one-shot hex digest function)
+XXHASH_VARIANTS = {
+    "xxh32": (xxhash.xxh32, xxhash.xxh32_hexdigest),
+    "xxh64": (xxhash.xxh64, xxhash.xxh64_hexdigest),
+    "xxh3_64": (xxhash.xxh3_64, xxhash.xxh3_64_hexdigest),
+    "xxh3_128": (xxhash.xxh3_128, xxhash.xxh3_128_hexdigest)
+}
+
+## Files up to this size are hashed with a single read and the one-shot API
+## ...(readall sizes its buffer from fstat: one read syscall, one contiguous buffer)
+XXHASH_ONESHOT_MAX = 1 << 20
+
+## Files from this size on are memory-mapped instead of read (mapping only
+## ...pulls ahead of a single read once the file no longer fits in a megabyte or so)
+XXHASH_MMAP_MIN = 1 << 20
+
+## Number of digests that `get_xxhash` remembers
+XXHASH_CACHE_SIZE = 4096
+
+## Files modified less than this long before being hashed are not memoized (coarsest common mtime granularity: FAT's 2 s)
+XXHASH_CACHE_SETTLE_NS = 2_000_000_000
+
+
 ## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
 class NotAGitRepository(Exception):
     """Raised when working directory is not a git repo (and neither any of the parents)."""
@@ -129,31 +197,297 @@ class MissingConfigurationFile(Exception):
 
 
 ## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+## (dir_target, backend) -> (refs snapshot, result) of the last `current_git_commit` call
+_GIT_CACHE: Dict[Tuple[str, str], Tuple[tuple, Dict[str, str]]] = {}
+
+## executable path -> (size, mtime_ns, version string) of the last successful `get_bin_version` call
+_VERSION_CACHE: Dict[str, Tuple[int, int, str]] = {}
+
+## Classes that `log_obj_instantiation` has already reported as lacking the ``pid`` property
+_PIDLESS_CLASSES: Set[type] = set()
+
+_MISSING = object()
+
+## `git log --format` placeholder for `git describe` output, only expanded by git 2.32 and later
+_GIT_DESCRIBE_PLACEHOLDER = "%(describe)"
+
+## (path, variant) -> ((st_dev, st_ino, st_size, st_mtime_ns), digest) of recently hashed files, oldest first
+_HASH_CACHE: Dict[Tuple[str, str], Tuple[tuple, str]] = {}
+_HASH_CACHE_LOCK = threading.Lock()
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _git_log_argv(dir_target: str) -> List[str]:
+    """Build a git command printing the abbreviated hash, `git describe` output (empty without tags) and ref names."""
+    ## No signature checks (log.showSignature=true); NUL-separated fields also outlast any other leading output
+    return [
+        "git", "-C", dir_target, "log", "-1", "--no-show-signature",
+        f"--format=%x00%h%x00{_GIT_DESCRIBE_PLACEHOLDER}%x00%D"
+    ]
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _git_describe_argv(dir_target: str) -> List[str]:
+    """Build the standalone `git describe` command used where `git log` cannot expand the placeholder."""
+    return ["git", "-C", dir_target, "describe", "--always"]
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _lacks_git_describe(log: dict) -> bool:
+    """Tell whether git is older than 2.32 and printed the describe placeholder of `_git_log_argv` verbatim."""
+    return log["rc"] == 0 and _GIT_DESCRIBE_PLACEHOLDER in log["stdout"]
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _parse_git_log(log: dict, dir_target: str, describe_log: Optional[dict] = None) -> Dict[str, str]:
+    """
+    Turn the output of the `_git_log_argv` command into a branch and commit hash dict.
+
+    :param log: a get_cmd_output-style dictionary with return code, stdout and stderr
+    :param dir_target: path to the git repository
+    :param describe_log: output of the `_git_describe_argv` command, for git versions without `%(describe)`
+    :returns: a branch and commit hash dict
+    :raises: NotAGitRepository, GitUnexpectedError
+    """
+    if not log["rc"] == 0 and "fatal: not a git repository" in log["stderr"]:
+        raise NotAGitRepository(dir_target)
+    if not log["rc"] == 0:
+        raise GitUnexpectedError(error_msg=log["stderr"].strip(), dir_target=dir_target)
+
+    fields = log["stdout"].split("\x00")
+    if len(fields) < 4:
+        raise GitUnexpectedError(error_msg=f"unexpected git log output: {log['stdout']!r}", dir_target=dir_target)
+    abbrev, describe, refs = (field.strip() for field in fields[-3:])
+    if describe == _GIT_DESCRIBE_PLACEHOLDER:
+        describe = describe_log["stdout"].strip() if describe_log and describe_log["rc"] == 0 else ""
+    commit = describe or abbrev
+
+    ## Ref names start with "HEAD -> <branch>" on a branch and with a bare "HEAD" when detached
+    head = refs.split(", ")[0]
+    branch = head.split(" -> ", 1)[1] if " -> " in head else "HEAD"
+
+    return {"commit": commit, "branch": branch}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@functools.lru_cache(maxsize=None)
+def _optional_module(name: str):
+    """Import an optional dependency on first use; return None if it is not installed."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _git_abbrev_len(repo) -> int:
+    """
+    Choose the abbreviated hash length the way git does: `core.abbrev` if it is a number, otherwise
+    scaled to the (approximate) number of packed objects, so that `pygit2` agrees with the git CLI.
+
+    :param repo: a pygit2.Repository instance
+    :returns: the minimum number of hexadecimal digits of an abbreviated object name
+    """
+    hex_size = len(str(repo.head.target))
+    try:
+        setting = str(repo.config["core.abbrev"]).strip().lower()
+    except KeyError:
+        setting = "auto"
+
+    if setting.isdigit():
+        return min(max(int(setting), 4), hex_size)
+    if setting in ("no", "false", "off"):
+        return hex_size
+
+    ## Linked worktrees keep their objects in the main repository
+    common_dir = repo.path
+    if os.path.isfile(os.path.join(repo.path, "commondir")):
+        with open(os.path.join(repo.path, "commondir"), encoding="utf-8") as file:
+            common_dir = os.path.join(repo.path, file.read().strip())
+
+    ## Same estimate as git: objects in pack indexes (the last fan-out entry), loose objects left out
+    count = 0
+    for path_idx in glob.glob(os.path.join(common_dir, "objects", "pack", "*.idx")):
+        with open(path_idx, "rb") as file:
+            header = file.read(8 + 256 * 4)
+        offset = 8 if header[:4] == b"\xfftOc" else 0  # version 2+ header, none in version 1
+        count += int.from_bytes(header[offset + 255 * 4:offset + 256 * 4], "big")
+
+    ## git's formula: half the bit length of the object count (rounded up) hex digits, never fewer than 7
+    return max((max(count.bit_length(), 1) + 1) // 2, 7)
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _read_git_commit_pygit2(pygit2, dir_target: str) -> Dict[str, str]:
+    """
+    In-process (libgit2) counterpart of running `_git_log_argv` and `_parse_git_log`.
+
+    :param pygit2: the pygit2 module
+    :param dir_target: path to the git repository
+    :returns: a branch and commit hash dict
+    :raises: NotAGitRepository, GitUnexpectedError
+    """
+    if not os.path.isdir(dir_target):
+        raise GitUnexpectedError(error_msg=f"fatal: cannot change to '{dir_target}'", dir_target=dir_target)
+
+    path_repo = pygit2.discover_repository(dir_target)
+    if path_repo is None:
+        raise NotAGitRepository(dir_target)
+
+    try:
+        repo = pygit2.Repository(path_repo)
+        commit = repo.describe(show_commit_oid_as_fallback=True, abbreviated_size=_git_abbrev_len(repo))
+        branch = "HEAD" if repo.head_is_detached else repo.head.shorthand
+    except (pygit2.GitError, KeyError, OSError) as error:
+        raise GitUnexpectedError(error_msg=str(error), dir_target=dir_target) from error
+
+    return {"commit": commit, "branch": branch}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _mtime_ns(path: str) -> Optional[int]:
+    """Return the modification time of `path` in nanoseconds, None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _dir_tree_mtimes(path: str) -> tuple:
+    """
+    Return the modification times of `path` and of every directory below it, which change whenever
+    an entry is created, removed or replaced by a rename (as git does when it writes a loose ref).
+
+    :param path: top directory of the tree
+    :returns: a sorted tuple of (directory, mtime_ns) pairs; None for the mtime if `path` does not exist
+    """
+    mtimes: List[Tuple[str, Optional[int]]] = []
+    pending = [path]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                pending.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            mtimes.append((current, os.stat(current).st_mtime_ns))
+        except FileNotFoundError:
+            mtimes.append((current, None))
+
+    return tuple(sorted(mtimes, key=lambda pair: pair[0]))
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _git_state_key(dir_target: str) -> Optional[tuple]:
+    """
+    Snapshot the refs that `current_git_commit` depends on: HEAD, the branch it points to, packed refs and tags.
+    Any commit, checkout or tag update (also under nested directories such as refs/tags/release/) changes the snapshot.
+
+    :param dir_target: a directory inside a git working tree
+    :returns: a hashable snapshot, or None if the repository layout is not understood (no caching then)
+    """
+    if "GIT_DIR" in os.environ:
+        return None
+
+    ## Find the repository the same way git does: the closest `.git` directory (or `gitdir:` file) upwards
+    path = os.path.abspath(dir_target)
+    while not os.path.exists(os.path.join(path, ".git")):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+    try:
+        git_dir = os.path.join(path, ".git")
+        if os.path.isfile(git_dir):
+            with open(git_dir, encoding="utf-8") as file:
+                git_dir = os.path.join(path, file.read().strip().split("gitdir: ", 1)[-1])
+
+        with open(os.path.join(git_dir, "HEAD"), encoding="utf-8") as file:
+            head = file.read().strip()
+
+        ## Linked worktrees keep their refs in the main repository
+        common_dir = git_dir
+        if os.path.isfile(os.path.join(git_dir, "commondir")):
+            with open(os.path.join(git_dir, "commondir"), encoding="utf-8") as file:
+                common_dir = os.path.join(git_dir, file.read().strip())
+    except OSError:
+        return None
+
+    ## Reftable repositories keep all refs in binary tables that this snapshot cannot tell apart
+    if os.path.isdir(os.path.join(common_dir, "reftable")):
+        return None
+
+    paths = [
+        os.path.join(git_dir, "HEAD"),
+        os.path.join(common_dir, "packed-refs")
+    ]
+    if head.startswith("ref: "):
+        paths.append(os.path.join(common_dir, head[len("ref: "):]))
+
+    return (git_dir, head) + tuple(_mtime_ns(p) for p in paths) + _dir_tree_mtimes(os.path.join(common_dir, "refs", "tags"))
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def current_git_commit(dir_target: str = "") -> Dict[str, str]:
     """
-    Using git via a shell fork, extract current branch and commit hashes.
+    Extract current branch and commit (`git describe --always`) hashes.
+    Reads the repository in-process if `pygit2` is installed, runs a single git subprocess otherwise.
+    Results are cached until the refs of the repository change.
 
     :returns: a branch and commit hash dict
-    :raises: NotAGitRepository
+    :raises: NotAGitRepository, GitUnexpectedError
     """
     if dir_target == "":
         dir_target = os.getcwd()
 
-    describe = cmd.get_cmd_output(f"git -C {dir_target} describe --always")
-    if not describe["rc"] == 0 and "fatal: not a git repository" in describe["stderr"]:
-        raise NotAGitRepository(dir_target)
-    if not describe["rc"] == 0:
-        raise GitUnexpectedError(error_msg=describe["stderr"], dir_target=dir_target)
-    commit = describe["stdout"]
+    ## Each backend keeps its own results, should they ever disagree
+    pygit2 = _optional_module("pygit2")
+    cache_key = (dir_target, "git" if pygit2 is None else "pygit2")
 
-    rev_parse = cmd.get_cmd_output(f"git -C {dir_target} rev-parse --abbrev-ref HEAD")
-    if not rev_parse["rc"] == 0 and "fatal: not a git repository" in rev_parse["stderr"]:
-        raise NotAGitRepository(dir_target=dir_target)
-    if not rev_parse["rc"] == 0:
-        raise GitUnexpectedError(error_msg=rev_parse["stderr"], dir_target=dir_target)
-    branch = rev_parse["stdout"]
+    key = _git_state_key(dir_target)
+    cached = _GIT_CACHE.get(cache_key)
+    if key is not None and cached is not None and cached[0] == key:
+        return dict(cached[1])
 
-    return {"commit": commit, "branch": branch}
+    if pygit2 is not None:
+        result = _read_git_commit_pygit2(pygit2, dir_target)
+    else:
+        log = cmd.get_cmd_output(_git_log_argv(dir_target))
+        describe_log = cmd.get_cmd_output(_git_describe_argv(dir_target)) if _lacks_git_describe(log) else None
+        result = _parse_git_log(log, dir_target, describe_log)
+
+    if key is not None:
+        _GIT_CACHE[cache_key] = (key, result)
+
+    return dict(result)
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+async def current_git_commit_async(dir_target: str = "") -> Dict[str, str]:
+    """
+    Same as `current_git_commit`, but awaits the git subprocess instead of blocking the event loop.
+
+    :returns: a branch and commit hash dict
+    :raises: NotAGitRepository, GitUnexpectedError
+    """
+    if dir_target == "":
+        dir_target = os.getcwd()
+
+    cache_key = (dir_target, "git")
+
+    key = _git_state_key(dir_target)
+    cached = _GIT_CACHE.get(cache_key)
+    if key is not None and cached is not None and cached[0] == key:
+        return dict(cached[1])
+
+    log = await cmd.get_cmd_output_exec_async(_git_log_argv(dir_target))
+    describe_log = await cmd.get_cmd_output_exec_async(_git_describe_argv(dir_target)) if _lacks_git_describe(log) else None
+    result = _parse_git_log(log, dir_target, describe_log)
+
+    if key is not None:
+        _GIT_CACHE[cache_key] = (key, result)
+
+    return dict(result)
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
@@ -167,62 +501,266 @@ def log_obj_instantiation(obj, logger: logging.LoggerAdapter, addendum: str = ""
     :return: None
     """
 
-    classname = obj.__class__.__name__
-
-    try:
-        name = obj.__name__
-    except AttributeError:
-        name = None
-
+    cls = obj.__class__
+    classname = cls.__name__
+    name = getattr(obj, "__name__", None)
     id_ = id(obj)
 
-    try:
-        pid = obj.pid
-    except AttributeError:
-        logger.debug(f"Class interface lacks the ``pid`` property: '{classname}'")
+    pid = getattr(obj, "pid", _MISSING)
+    if pid is _MISSING:
+        ## Once per class is enough: every other instance would repeat the same message
+        if cls not in _PIDLESS_CLASSES:
+            _PIDLESS_CLASSES.add(cls)
+            logger.debug("Class interface lacks the ``pid`` property: '%s'", classname)
         pid = None
 
-    logger.info(f"New instance of '{classname}': name={name}, id={id_}, pid={pid}. {addendum}".strip())
+    if addendum:
+        logger.info("New instance of '%s': name=%s, id=%s, pid=%s. %s", classname, name, id_, pid, addendum)
+    else:
+        logger.info("New instance of '%s': name=%s, id=%s, pid=%s.", classname, name, id_, pid)
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def ascii2qtask_id(ascii: str) -> str:
-    return "".join([chr(int(c)) for c in ascii.split("-")])
+    codes = ascii.split("-")
+    try:
+        ## Codes up to 255 (the usual case) are decoded in one go
+        return bytes(map(int, codes)).decode("latin-1")
+    except ValueError:
+        return "".join([chr(int(c)) for c in codes])
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def qtask_id2ascii(qtask_id: str, delim: str = "-") -> str:
-    return delim.join([str(ord(c)) for c in qtask_id])
+    try:
+        ## Iterating over bytes yields code points without per-character ord() and str() calls
+        return delim.join([BYTE_STRINGS[b] for b in qtask_id.encode("latin-1")])
+    except UnicodeEncodeError:
+        return delim.join([str(ord(c)) for c in qtask_id])
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
-def get_xxhash32(path: str) -> str:
+def _hash_open_file(file, size: int, variant: str, chunk_size: int, allow_mmap: bool) -> str:
+    """Hash an unbuffered binary file object of `size` bytes (see `get_xxhash`)."""
+    hasher, hexdigest = XXHASH_VARIANTS[variant]
+
+    if size <= XXHASH_ONESHOT_MAX:
+        return hexdigest(file.readall())
+
+    ## Large files: let the C extension scan the page cache directly, without copies
+    if allow_mmap and size >= XXHASH_MMAP_MIN:
+        try:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                ## One-shot call on the whole mapping: no hasher object, no Python-level loop
+                return hexdigest(mapped)
+        except (OSError, ValueError):
+            pass  # not mappable (e.g., special files); stream it instead
+
+    ## Feed the hasher from a single reusable buffer to keep memory usage flat on large files
+    x = hasher()
+    buffer = bytearray(min(chunk_size, size) or chunk_size)
+    view = memoryview(buffer)
+    while True:
+        count = file.readinto(buffer)
+        if not count:
+            break
+        x.update(view[:count])
+
+    return x.hexdigest()
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def get_xxhash(path: str, variant: str = "xxh3_64", chunk_size: int = 1 << 20, allow_mmap: bool = True, use_cache: bool = True) -> str:
+    """
+    Return an xxhash hex digest of file.
+    Digests are memoized on the file's identity, size and mtime: an unchanged file is not read again.
+
+    :param path: path to the file
+    :param variant: one of the XXHASH_VARIANTS (XXH3 is the fastest on 64-bit hosts)
+    :param chunk_size: size of the read buffer used for files larger than XXHASH_ONESHOT_MAX
+    :param allow_mmap: memory-map files of XXHASH_MMAP_MIN bytes or more; disable for files that
+        may get truncated while being hashed (accessing truncated mapped pages raises SIGBUS)
+    :param use_cache: return a memoized digest if the file looks unchanged; disable to always read
+        the file (e.g., for integrity checks that must not trust size and mtime)
+    :return: a hex string, 8 (xxh32), 16 (xxh64, xxh3_64) or 32 (xxh3_128) characters wide
+    :raises: ValueError
+    """
+    if variant not in XXHASH_VARIANTS:
+        raise ValueError(f"Unsupported xxhash variant: '{variant}'")
+
+    ## Unbuffered: reads go straight into our own buffer
+    with open(path, "rb", buffering=0) as file:
+        status = os.fstat(file.fileno())
+        cache_key = (path, variant)
+        stat_key = (status.st_dev, status.st_ino, status.st_size, status.st_mtime_ns)
+
+        cached = _HASH_CACHE.get(cache_key) if use_cache else None
+        if cached is not None and cached[0] == stat_key:
+            return cached[1]
+
+        hashed_ns = time.time_ns()
+        digest = _hash_open_file(file, status.st_size, variant, chunk_size, allow_mmap)
+
+    ## A rewrite within the mtime granularity could keep the same stat: only remember settled files
+    if status.st_mtime_ns + XXHASH_CACHE_SETTLE_NS <= hashed_ns:
+        with _HASH_CACHE_LOCK:
+            _HASH_CACHE.pop(cache_key, None)
+            if len(_HASH_CACHE) >= XXHASH_CACHE_SIZE:
+                del _HASH_CACHE[next(iter(_HASH_CACHE))]
+            _HASH_CACHE[cache_key] = (stat_key, digest)
+
+    return digest
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def get_xxhash3(path: str, chunk_size: int = 1 << 20, allow_mmap: bool = True, use_cache: bool = True) -> str:
+    """
+    Return an XXH3 (64-bit) hash digest of file.
+
+    :param path: path to the file
+    :param chunk_size: size of the read buffer used for large files
+    :param allow_mmap: memory-map large files (see `get_xxhash`)
+    :param use_cache: reuse memoized digests of unchanged files (see `get_xxhash`)
+    :return: a 16 ASCII-character wide string
+    """
+    return get_xxhash(path, variant="xxh3_64", chunk_size=chunk_size, allow_mmap=allow_mmap, use_cache=use_cache)
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def get_xxhash32(path: str, chunk_size: int = 1 << 20, allow_mmap: bool = True, use_cache: bool = True) -> str:
     """
     Return an xxhash-32 hash digest of file.
 
     :param path: path to the file
+    :param chunk_size: size of the read buffer used for large files
+    :param allow_mmap: memory-map large files (see `get_xxhash`)
+    :param use_cache: reuse memoized digests of unchanged files (see `get_xxhash`)
     :return: an 8 ASCII-character wide string
     """
-    x = xxhash.xxh32()
+    return get_xxhash(path, variant="xxh32", chunk_size=chunk_size, allow_mmap=allow_mmap, use_cache=use_cache)
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def get_xxhash_many(paths: Iterable[str], variant: str = "xxh3_64", workers: int = 8, chunk_size: int = 1 << 20, use_cache: bool = True) -> Dict[str, str]:
+    """
+    Return xxhash hex digests of many files, hashed concurrently by a pool of threads.
+    The xxhash extension releases the GIL while hashing, and so does reading, thus threads overlap both.
+
+    :param paths: paths to the files (duplicates are hashed once)
+    :param variant: one of the XXHASH_VARIANTS
+    :param workers: maximum number of files hashed at the same time
+    :param chunk_size: size of the read buffer used for large files (see `get_xxhash`)
+    :param use_cache: reuse memoized digests of unchanged files (see `get_xxhash`)
+    :return: a dictionary of path -> hex digest, in the order of `paths`
+    :raises: ValueError, OSError (the first error encountered, in the order of `paths`)
+    """
+    if variant not in XXHASH_VARIANTS:
+        raise ValueError(f"Unsupported xxhash variant: '{variant}'")
+
+    unique_paths = list(dict.fromkeys(paths))
+    if len(unique_paths) < 2 or workers < 2:
+        return {path: get_xxhash(path, variant=variant, chunk_size=chunk_size, use_cache=use_cache) for path in unique_paths}
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(unique_paths))) as executor:
+        digests = executor.map(functools.partial(get_xxhash, variant=variant, chunk_size=chunk_size, use_cache=use_cache), unique_paths)
+        return dict(zip(unique_paths, digests))
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def get_xxhash32_many(paths: Iterable[str], workers: int = 8, chunk_size: int = 1 << 20, use_cache: bool = True) -> Dict[str, str]:
+    """
+    Return xxhash-32 hash digests of many files (see `get_xxhash_many`).
+
+    :param paths: paths to the files
+    :param workers: maximum number of files hashed at the same time
+    :param chunk_size: size of the read buffer used for large files
+    :param use_cache: reuse memoized digests of unchanged files (see `get_xxhash`)
+    :return: a dictionary of path -> 8 ASCII-character wide string
+    """
+    return get_xxhash_many(paths, variant="xxh32", workers=workers, chunk_size=chunk_size, use_cache=use_cache)
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _config_file_key(status: os.stat_result) -> Tuple[int, int, int]:
+    """Identify a version of a configuration file by its mtime, size and inode, all from a single stat call."""
+    ## A rewrite within the mtime granularity mostly changes the size; a replacement by rename changes the inode
+    return status.st_mtime_ns, status.st_size, status.st_ino
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@functools.lru_cache(maxsize=32)
+def _load_config(path: str, file_key: Tuple[int, int, int]) -> Tuple[Optional[dict], str]:
+    """
+    Parse a JSON configuration file, memoized on its path, modification time, size and inode.
+    Malformed files are memoized as well, so that they are not parsed again until modified.
 
+    :param path: resolved path to the configuration file
+    :param file_key: `_config_file_key` of the file (only serves as a part of the cache key)
+    :return: a (dictionary representation of a JSON file, "") tuple, or (None, description of the problem)
+    :raises: OSError if the file cannot be read (not memoized)
+    """
     with open(path, "rb") as file:
         contents = file.read()
-        x.update(contents)
 
-    return x.hexdigest()
+    ## Empty files are common enough (placeholders, interrupted writes) to be told apart without parsing
+    if not contents.strip():
+        return None, "empty file"
+
+    ## orjson (if installed) parses several times faster than the standard library
+    orjson = _optional_module("orjson")
+    try:
+        config = orjson.loads(contents) if orjson is not None else json.loads(contents)
+    except ValueError as error:  # JSONDecodeError (both parsers), UnicodeDecodeError
+        return None, repr(error)
+
+    if not isinstance(config, dict):
+        return None, f"expected a JSON object, got: {type(config).__name__}"
+
+    return config, ""
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def _find_configs(file_name: str, locations: Tuple[str, ...], logger: logging.LoggerAdapter) -> Iterator[Tuple[str, str, tuple]]:
+    """
+    Yield the paths of `file_name` found under `locations` (as given and resolved), in the order of precedence.
+    Each candidate costs a single stat call, which covers the directory and the file at once.
+
+    :param file_name: name of the configuration file
+    :param locations: candidate directories, in the order of precedence
+    :param logger: a logging.LoggerAdapter instance
+    :return: (path, real path, `_config_file_key`) tuples, lazily: the search stops with the first usable file
+    """
+    ## Skip unset locations and duplicates, keeping the order of precedence
+    for location in filter(None, dict.fromkeys(locations)):
+        path_config = os.path.join(location, file_name)
+
+        try:
+            status = os.stat(path_config)
+        except OSError:
+            status = None
+
+        if status is None or not stat.S_ISREG(status.st_mode):
+            logger.debug("'%s' not found under: '%s'; trying next location ...", file_name, location)
+            continue
+
+        yield path_config, os.path.realpath(path_config), _config_file_key(status)
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def discover_config(name: str, logger: logging.LoggerAdapter, from_prefix: bool = True, dir_: str = "") -> dict:
     """
     Look for a given filename in typical locations and parse it as a JSON file.
-    First of all, the function will attempt to look in the directory defined in
-    the <PREFIX>_CONFIG env variable, where <PREFIX> is the extensionless `name`.
+    The locations are tried in this order: `dir_`, the directory defined in the <PREFIX>_CONFIG
+    env variable (where <PREFIX> is the extensionless `name`), the current directory, the home
+    directory, ~/.local/share/<PREFIX> and /etc/<PREFIX>. Unreadable files are skipped like missing ones.
 
     :param name: name of the configuration file
     :param logger: a logging.LoggerAdapter instance
     :param from_prefix: build a config file name by replacing the extension with '.cfg.json'
-    :return: a dictionary representation of a JSON file
+    :param dir_: a directory to look in before all the others
+    :return: a dictionary representation of a JSON file (a private copy of the cached one)
     """
     if from_prefix:
         prefix = os.path.splitext(os.path.basename(name))[0]
@@ -231,43 +769,59 @@ def discover_config(name: str, logger: logging.LoggerAdapter, from_prefix: bool
         prefix = ""
         file_name = name
 
-    logger.debug(f"Expecting a configuration file with name: '{file_name}'")
+    logger.debug("Expecting a configuration file with name: '%s'", file_name)
 
-    ## Choose valid paths from the following set
-    locations = filter(
-        lambda d: d is not None and os.path.isdir(d),
-        set((
+    ## The search is repeated on every call (one stat per location), so that a file created
+    ## ...in a location of higher precedence takes over; only parsing is memoized
+    candidates = _find_configs(
+        file_name=file_name,
+        locations=(
             dir_,
             os.environ.get(f"{prefix.upper()}_CONFIG") or "",
             os.path.abspath(os.curdir),
             os.path.expanduser("~"),
             os.path.expanduser(f"~/.local/share/{prefix}"),
             f"/etc/{prefix}"
-        ))
+        ),
+        logger=logger
     )
 
-    ## Look for the file in each valid location
-    for location in locations:
-        path_config = os.path.join(location, file_name)
-
+    for path_config, path_real, file_key in candidates:
         try:
-            with open(path_config, encoding="utf-8") as file:
-                try:
-                    config = json.load(file)
-                    logger.info(f"Using configuration file: '{os.path.realpath(path_config)}'")
-                    return config
-                except Exception as error:
-                    err_message = f"Failed to parse configuration file: '{path_config}'"
-                    logger.critical(f"{err_message} ({repr(error)}). Aborting.")
-                    raise BadConfigurationFile(err_message, path_config)
-        except IOError:
-            logger.debug(f"'{file_name}' not found under: '{location}'; trying next location ...")
+            config, error_repr = _load_config(path_real, file_key)
+        except OSError as error:
+            ## e.g., PermissionError: same as a missing file
+            logger.debug("'%s' cannot be read (%r); trying next location ...", path_config, error)
+            continue
+        except Exception as error:
+            config, error_repr = None, repr(error)
+
+        if config is None:
+            err_message = f"Failed to parse configuration file: '{path_config}'"
+            logger.critical("%s (%s). Aborting.", err_message, error_repr)
+            raise BadConfigurationFile(err_message, path_config)
+
+        logger.info("Using configuration file: '%s'", path_real)
+        ## Callers may mutate their config: never hand out the memoized one
+        return copy.deepcopy(config)
 
     err_message = "Configuration file not found"
-    logger.critical(f"{err_message}: '{file_name}'. Aborting.")
+    logger.critical("%s: '%s'. Aborting.", err_message, file_name)
     raise MissingConfigurationFile(err_message, file_name)
 
 
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@functools.lru_cache(maxsize=None)
+def _healthchecks_session():
+    """Create (once) the requests.Session whose kept-alive connections are reused by all heartbeat pings."""
+    import requests
+
+    session = requests.Session()
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+    return session
+
+
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def ping_healthchecks(uuid: str, logger: logging.LoggerAdapter, status: str = "", quiet: bool = False) -> None:
     """
@@ -279,18 +833,21 @@ def ping_healthchecks(uuid: str, logger: logging.LoggerAdapter, status: str = ""
     :param quiet: log only errors
     """
 
+    ## Deferred import: requests (and urllib3) dominate the import time of this module
+    import requests
+
     if status and status not in ("start", "fail"):
-        logger.error(f"Received unknown status: '{status}'. Skipping.")
+        logger.error("Received unknown status: '%s'. Skipping.", status)
         return
 
     hc_url = f"https://hc-ping.com/{uuid}{'/' + status if status else ''}"
 
     try:
         if not quiet:
-            logger.info(f"({status.strip('/') or 'OK'}) Sending a heartbeat ping to: '{hc_url}' ...")
-        requests.get(url=hc_url, timeout=10)
+            logger.info("(%s) Sending a heartbeat ping to: '%s' ...", status or "OK", hc_url)
+        _healthchecks_session().get(hc_url, timeout=10)
     except requests.RequestException as error:
-        logger.error(f"Ping failed ({error}): '{hc_url}{status}'")
+        logger.error("Ping failed (%s): '%s'", error, hc_url)
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
@@ -303,25 +860,25 @@ def purge_dir_contents(target_dir: str) -> None:
     """
     with os.scandir(target_dir) as entries:
         for entry in entries:
-            if entry.is_dir() and not entry.is_symlink():
-                shutil.rmtree(entry.path)
-            else:
-                os.remove(entry.path)
+            ## A single (usually cached) type check, which is False for symlinks to directories
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass  # removed concurrently
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def colorize(text: str, name: str, bright: bool = False, reverse: bool = False, bold: bool = False) -> str:
-    color = ANSI_COLORS[name]
+    return f"{ANSI_PREFIXES[(name, bool(bright), bool(bold), bool(reverse))]}{text}{ANSI_RESET}"
 
-    if bright:
-        color = color.replace("m", ";1m")
-    if bold:
-        color = color + ANSI_COLORS["bold"]
-    if reverse:
-        color = color + ANSI_COLORS["reversed"]
 
-    reset = ANSI_COLORS["reset"]
-    return f"{color}{text}{reset}"
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def colorize_bytes(text: bytes, name: str, bright: bool = False, reverse: bool = False, bold: bool = False) -> bytes:
+    """Same as `colorize`, for text that is already encoded (no decode/encode round trip)."""
+    return b"".join((ANSI_PREFIXES_BYTES[(name, bool(bright), bool(bold), bool(reverse))], text, ANSI_RESET_BYTES))
 
 
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
@@ -334,16 +891,25 @@ def get_bin_version(path: str, logger: logging.LoggerAdapter) -> str:
     :raises: NoVersionFlagImplemented
     :returns: string, containing the first line of stdout
     """
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Invalid executable path: '{path}'")
+    try:
+        status = os.stat(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Invalid executable path: '{path}'") from None
+
+    ## The version can only change along with the binary itself
+    cached = _VERSION_CACHE.get(path)
+    if cached is not None and cached[:2] == (status.st_size, status.st_mtime_ns):
+        version_string = cached[2]
+    else:
+        output = cmd.get_cmd_output([path, "--version"])
 
-    output = cmd.get_cmd_output(f"{path} --version")
+        if output["rc"] != 0:
+            logger.error(output['stderr'])
+            raise VersionFlagNotImplemented(path=path, stderr=output['stderr'], rc=output['rc'])
 
-    if output["rc"] != 0:
-        logger.error(output['stderr'])
-        raise VersionFlagNotImplemented(path=path, stderr=output['stderr'], rc=output['rc'])
+        version_string = output['stdout'].strip().split("\n")[0]
+        _VERSION_CACHE[path] = (status.st_size, status.st_mtime_ns, version_string)
 
-    version_string = output['stdout'].strip().split("\n")[0]
-    logger.info(f"Detected usable {os.path.basename(path)} ({version_string})")
+    logger.info("Detected usable %s (%s)", os.path.basename(path), version_string)
 
     return version_string
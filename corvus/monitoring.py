@@ -1,13 +1,136 @@
 """Tools for monitoring directories."""
 import logging
+import os
+import sys
 import time
 
-from corvus.misc import get_xxhash32
+from corvus.misc import get_xxhash3
 
 
-def has_stabilized_hash(filename: str, max_seconds: int = -1, logger: logging.LoggerAdapter = None) -> bool:
+## Coarse (whole-second) mtimes can hide a same-size rewrite for up to two seconds (FAT/exFAT store 2 s steps);
+## fine-grained ones still lag behind the wall clock by a kernel tick
+MTIME_COARSE_NS = 1_000_000_000
+MTIME_COARSE_GRANULARITY_NS = 2_000_000_000
+MTIME_TICK_NS = 10_000_000
+
+## Large files are only hashed after their first and last bytes have been compared with the previous tick
+EDGE_BYTES = 64
+EDGE_CHECK_MIN_SIZE = 1 << 16
+
+
+def _mtime_settled(mtime_ns: int, checked_ns: int) -> bool:
+    """
+    Tell if any write to a file after `checked_ns` would have moved its mtime past `mtime_ns`.
+    :param mtime_ns: modification time of the file, as reported by stat
+    :param checked_ns: wall clock time of the previous stat call
+    :return: True if an unchanged mtime proves that the file was not modified since `checked_ns`
+    """
+    granularity = MTIME_COARSE_GRANULARITY_NS if mtime_ns % MTIME_COARSE_NS == 0 else MTIME_TICK_NS
+    return mtime_ns + granularity <= checked_ns
+
+
+def _inotify_simple():
+    """Return the inotify_simple module if it is installed and the kernel supports inotify, None otherwise."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import inotify_simple  # type: ignore
+    except ImportError:
+        return None
+    return inotify_simple
+
+
+def _read_edges(filename: str, size: int) -> bytes:
+    """
+    Read the first and the last EDGE_BYTES of a file: a cheap prefilter that spots most rewrites without hashing.
+    :param filename: target file
+    :param size: size of the file, as reported by stat
+    :return: the head and the tail of the file, concatenated
+    """
+    ## A bare descriptor: two positioned reads need no file object
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        return os.pread(fd, EDGE_BYTES, 0) + os.pread(fd, EDGE_BYTES, max(size - EDGE_BYTES, 0))
+    finally:
+        os.close(fd)
+
+
+def has_stabilized_hash(filename: str, max_seconds: int = -1, logger: logging.LoggerAdapter = None, use_inotify: bool = False) -> bool:
+    """
+    Return False unless under `max_seconds` the XXH3 digest of the `file` stops changing.
+    Size and mtime are polled first: the file is only hashed when they cannot tell the answer.
+    With `use_inotify` on Linux and `inotify_simple` installed, the file is not read at all: a second without
+    modification events is the same signal that two equal once-per-second digests would give.
+    Only opt in for local filesystems written through write(2): inotify does not see changes
+    made on another host (NFS, SMB), by FUSE servers or through shared memory mappings.
+    :param filename: target file
+    :param max_seconds: observe hash changes for at most this many seconds
+    :param logger: a logging.LoggerAdapter instance (default=None)
+    :param use_inotify: wait for inotify events instead of polling, where available (default=False)
+    :return: True if hash has stabilized, False otherwise
+    """
+    inotify_simple = _inotify_simple() if use_inotify else None
+    if inotify_simple is not None:
+        try:
+            inotify = inotify_simple.INotify()
+        except OSError:
+            inotify = None  # e.g., out of inotify instances; poll instead
+
+        if inotify is not None:
+            with inotify:
+                return _has_stabilized_events(inotify, inotify_simple.flags, filename, max_seconds, logger)
+
+    return _has_stabilized_polling(filename, max_seconds, logger)
+
+
+def _has_stabilized_events(inotify, flags, filename: str, max_seconds: int, logger: logging.LoggerAdapter) -> bool:
+    """
+    Event-driven counterpart of `_has_stabilized_polling`, with the same once-per-second ticks:
+    the file has stabilized at the first tick that follows a whole tick without changes to it.
+    :param inotify: an inotify_simple.INotify instance
+    :param flags: the inotify_simple.flags enumeration
+    :param filename: target file
+    :param max_seconds: observe changes for at most this many seconds
+    :param logger: a logging.LoggerAdapter instance (default=None)
+    :return: True if the file has stabilized, False otherwise
+    """
+    ## Watch the directory rather than the inode, so that files replaced by a rename are noticed too
+    dir_name, base_name = os.path.split(os.path.abspath(filename))
+    inotify.add_watch(
+        dir_name,
+        flags.MODIFY | flags.CLOSE_WRITE | flags.ATTRIB | flags.CREATE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO
+    )
+    os.stat(filename)  # raise FileNotFoundError, as the polling loop does
+
+    started = time.monotonic()
+    tick = 0
+    changed = True  # nothing to compare with before the first tick
+    while max_seconds != 0:
+        if not changed:
+            if logger:
+                logger.info("No changes to file for a second: '%s'", filename)
+            return True
+
+        changed = False
+        tick += 1
+        remaining = started + tick - time.monotonic()
+        while remaining > 0:
+            events = inotify.read(timeout=int(remaining * 1000) + 1)
+            ## An overflowed event queue (nameless event) may have dropped events for the file
+            changed = changed or any(event.name == base_name or event.mask & flags.Q_OVERFLOW for event in events)
+            remaining = started + tick - time.monotonic()
+
+        if logger:
+            logger.debug("%s: changed=%s", filename, changed)
+
+        max_seconds -= 1
+
+    return False
+
+
+def _has_stabilized_polling(filename: str, max_seconds: int, logger: logging.LoggerAdapter) -> bool:
     """
-    Return False unless under `max_seconds` the xxhash digest of the `file` stops changing.
+    Poll the size and mtime of the file once a second, hashing it only when they cannot tell the answer.
     :param filename: target file
     :param max_seconds: observe hash changes for at most this many seconds
     :param logger: a logging.LoggerAdapter instance (default=None)
@@ -15,18 +138,44 @@ def has_stabilized_hash(filename: str, max_seconds: int = -1, logger: logging.Lo
     """
 
     old = None
+    old_key = None
+    old_edges = None
+    checked_ns = 0
     while max_seconds != 0:
-        new = get_xxhash32(filename)
+        now_ns = time.time_ns()
+        status = os.stat(filename)
+        ## Device and inode too: a rename-replace may bring along the same size and mtime
+        key = (status.st_size, status.st_mtime_ns, status.st_dev, status.st_ino)
 
-        if new == old:
+        ## Same file, size and mtime, and no write could have slipped in unnoticed: content is unchanged
+        if key == old_key and _mtime_settled(status.st_mtime_ns, checked_ns):
             if logger:
-                logger.info(f"Digest stabilized for file (xxhash32): '{filename}'")
+                logger.info("Size and mtime stabilized for file: '%s'", filename)
             return True
 
+        ## Same size as the previous tick, but its head or tail changed: different content, just as well
+        edges = _read_edges(filename, key[0]) if key[0] >= EDGE_CHECK_MIN_SIZE else None
+        edges_differ = edges is not None and old_edges is not None and edges != old_edges
+
+        ## A different size means different content; hashing would tell nothing new
+        if (old_key is not None and key[0] != old_key[0]) or edges_differ:
+            new = None
+        else:
+            ## The file may still be rewritten (truncated) by its producer: no mmap
+            new = get_xxhash3(filename, allow_mmap=False)
+
+            if new == old:
+                if logger:
+                    logger.info("Digest stabilized for file (xxh3_64): '%s'", filename)
+                return True
+
         if logger:
-            logger.debug(f"{filename}: {old} -> {new}")
+            logger.debug("%s: %s -> %s", filename, old, new)
 
         old = new
+        old_key = key
+        old_edges = edges
+        checked_ns = now_ns
         time.sleep(1)
         max_seconds -= 1
 
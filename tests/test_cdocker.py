@@ -6,7 +6,8 @@ from corvus import cdocker
 
 @pytest.mark.parametrize("name,tag,expected", [
     ("hello-world", "", True),
-    ("busybox", "stable-glibc", True)
+    ("busybox", "stable-glibc", True),
+    ("docker.io/library/hello-world", "", True)
 ])
 def test_image_exists_true(name, tag, expected):
     dclient = docker.client.from_env()
@@ -52,3 +53,13 @@ def test_get_image_labels():
 
     actual = cdocker.get_image_labels("scratch-labels", "latest")
     assert actual == expected
+
+
+def test_images_exist():
+    dclient = docker.from_env()
+    dclient.containers.run(image="hello-world:latest", remove=True)
+
+    expected = {"hello-world:latest": True, "non-existent-image:1.0.0": False}
+    actual = cdocker.images_exist([("hello-world", ""), ("non-existent-image", "1.0.0")])
+
+    assert actual == expected
@@ -0,0 +1,107 @@
+"""Tests for the corvus.cmd package."""
+
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+from corvus import cmd
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+@pytest.mark.parametrize("command,rc,stdout", [
+    ("echo hi", 0, "hi"),
+    ("echo hi # comment", 0, "hi"),
+    ("FOO=bar env | grep '^FOO='", 0, "FOO=bar"),
+    ("exit 3", 3, ""),
+    ("cd /tmp && pwd", 0, "/tmp"),
+    ("type ls > /dev/null", 0, ""),
+    ("non-existent-command-xyz", 127, ""),
+])
+def test_get_cmd_output_shell_string(command, rc, stdout) -> None:
+    actual = cmd.get_cmd_output(command)
+
+    assert actual["rc"] == rc
+    assert actual["stdout"] == stdout
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_cmd_output_argv() -> None:
+    ## No shell in between: the argument reaches the program verbatim
+    actual = cmd.get_cmd_output(["echo", "$HOME # not a comment"])
+
+    assert actual == {"rc": 0, "stdout": "$HOME # not a comment", "stderr": ""}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_cmd_output_argv_not_found() -> None:
+    actual = cmd.get_cmd_output(["/non-existent/binary"])
+
+    assert actual["rc"] == 127
+    assert actual["stderr"]
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_cmd_output_argv_not_executable() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "script.sh")
+        with open(path, "w", encoding="ascii") as file:
+            file.write("#!/bin/sh\necho hi\n")
+
+        actual = cmd.get_cmd_output([path])
+
+    assert actual["rc"] == 126
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_cmd_output_tempfile_capture() -> None:
+    ## Well past the pipe buffer size, so that the spooled output is read back in full
+    actual = cmd.get_cmd_output(["seq", "100000"], stdout_to=cmd.TEMPFILE, stderr_to=cmd.TEMPFILE)
+
+    assert actual["rc"] == 0
+    assert actual["stdout"].split("\n") == [str(n) for n in range(1, 100001)]
+    assert actual["stderr"] == ""
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_cmd_output_devnull_capture() -> None:
+    actual = cmd.get_cmd_output("echo out; echo err >&2; exit 2", stdout_to=subprocess.DEVNULL)
+
+    assert actual == {"rc": 2, "stdout": "", "stderr": "err"}
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+def test_make_path_comment_describes_symlink_target() -> None:
+    pytest.importorskip("magic")
+    logger = logging.getLogger("test_cmd")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "notes.txt")
+        with open(path, "w", encoding="ascii") as file:
+            file.write("plain text\n")
+        link = os.path.join(tmpdir, "link.txt")
+        os.symlink(path, link)
+
+        actual = cmd.make_path_comment(link, "Found", logger, work_magic=True)
+
+    assert actual.startswith("Found (11 B, ASCII text")
+    assert actual.endswith(f"): '{link}'")
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_make_path_comment_size_only_without_magic(monkeypatch) -> None:
+    ## A None entry makes `import magic` raise ImportError, as if python-magic were not installed
+    monkeypatch.setitem(sys.modules, "magic", None)
+    logger = logging.getLogger("test_cmd")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "notes.txt")
+        with open(path, "w", encoding="ascii") as file:
+            file.write("plain text\n")
+
+        actual = cmd.make_path_comment(path, "Found", logger)
+
+    assert actual == f"Found (11 B): '{path}'"
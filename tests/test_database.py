@@ -0,0 +1,139 @@
+"""Tests for the corvus.database package."""
+
+import logging
+import os
+import tempfile
+
+import pytest
+import sqlalchemy
+from sqlalchemy.orm import DeclarativeBase, validates
+
+from corvus import database
+from corvus import logs
+
+
+logger = logs.get_colored_logger(scriptname=__file__, level=logging.DEBUG, persist=False)
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+@pytest.fixture
+def engine():
+    """A file-backed database: unlike an in-memory one, each connection checked out of the pool is a separate session."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = sqlalchemy.create_engine(f"sqlite:///{os.path.join(tmpdir, 'birds.db')}")
+        with engine.begin() as conn:
+            conn.exec_driver_sql('CREATE TABLE "birds" ("name" TEXT PRIMARY KEY, "wingspan" INTEGER)')
+            conn.exec_driver_sql("""INSERT INTO "birds" VALUES ('raven', 120), ('crow', 95)""")
+        yield engine
+        engine.dispose()
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+@pytest.mark.parametrize("column,value,expected", [
+    ("name", "raven", True),
+    ("name", "magpie", False),
+    ("wingspan", 95, True),
+])
+def test_row_exists(engine, column, value, expected):
+    actual = database.row_exists("birds", database.QueryCriterion(column, value), engine=engine, logger=logger)
+
+    assert actual is expected
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_row_exists_reuses_connection(engine):
+    with engine.connect() as conn:
+        conn.exec_driver_sql("""INSERT INTO "birds" VALUES ('jay', 40)""")
+
+        ## The uncommitted row is only visible through the same connection
+        actual = database.row_exists("birds", database.QueryCriterion("name", "jay"), engine=engine, logger=logger, conn=conn)
+
+    assert actual is True
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_row_exists_database_error(engine):
+    actual = database.row_exists("no_such_table", database.QueryCriterion("name", "raven"), engine=engine, logger=logger)
+
+    assert actual is False
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+class Base(DeclarativeBase):
+    pass
+
+
+class Nest(Base):
+    __tablename__ = "nests"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    species = sqlalchemy.Column(sqlalchemy.String)
+    eggs = sqlalchemy.Column(sqlalchemy.Integer)
+
+
+class Sighting(Base):
+    __tablename__ = "sightings"
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    species = sqlalchemy.Column(sqlalchemy.String)
+    revision = sqlalchemy.Column(sqlalchemy.Integer, default=0, onupdate=99)
+
+    @validates("species")
+    def normalize_species(self, key, value):
+        return value.lower()
+
+
+@pytest.fixture
+def nests_engine(engine):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.insert(Nest).values(id=1, species="raven", eggs=4))
+    return engine
+
+
+def read_nests(engine) -> list:
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(sqlalchemy.select(Nest.id, Nest.species, Nest.eggs).order_by(Nest.id))]
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@pytest.mark.parametrize("native", [True, False])
+@pytest.mark.parametrize("pkey_value,attributes,expected_pkey,expected_rows", [
+    (1, {"eggs": 5}, 1, [(1, "raven", 5)]),  # update
+    (2, {"species": "crow", "eggs": 3}, 2, [(1, "raven", 4), (2, "crow", 3)]),  # insert
+    (1, {}, 1, [(1, "raven", 4)]),  # nothing to update: the row is left as is
+])
+def test_upsert_orm(monkeypatch, nests_engine, native, pkey_value, attributes, expected_pkey, expected_rows):
+    if not native:
+        monkeypatch.delitem(database.UPSERT_INSERTS, "sqlite")
+
+    actual = database.upsert_orm(Nest, attributes, nests_engine, database.ORMPrimaryKey("id", pkey_value), logger)
+
+    assert actual == expected_pkey
+    assert read_nests(nests_engine) == expected_rows
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_upsert_orm_generated_pkey(nests_engine):
+    actual = database.upsert_orm(Nest, {"species": "jay", "eggs": 2}, nests_engine, database.ORMPrimaryKey("id", None), logger)
+
+    assert actual == 2
+    assert read_nests(nests_engine) == [(1, "raven", 4), (2, "jay", 2)]
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_upsert_orm_unknown_attribute(nests_engine):
+    with pytest.raises(AttributeError):
+        database.upsert_orm(Nest, {"feathers": 1}, nests_engine, database.ORMPrimaryKey("id", 1), logger)
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_upsert_orm_applies_onupdate_and_validators(nests_engine):
+    pkey = database.ORMPrimaryKey("id", 1)
+    database.upsert_orm(Sighting, {"species": "Raven"}, nests_engine, pkey, logger)
+    database.upsert_orm(Sighting, {"species": "Crow"}, nests_engine, pkey, logger)
+
+    with nests_engine.connect() as conn:
+        actual = tuple(conn.execute(sqlalchemy.select(Sighting.species, Sighting.revision)).one())
+
+    assert actual == ("crow", 99)
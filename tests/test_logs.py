@@ -0,0 +1,96 @@
+"""Tests for the corvus.logs package."""
+
+import logging
+import os
+
+import pytest
+
+from corvus.logs import ColoredFormatter, get_colored_logger
+
+
+@pytest.mark.parametrize("level,prefix", [
+    (logging.DEBUG, ""),
+    (logging.INFO, ""),
+    (logging.WARNING, ColoredFormatter.ANSI_YELLOW),
+    (logging.ERROR, ColoredFormatter.ANSI_RED),
+    (logging.CRITICAL, ColoredFormatter.ANSI_RED),
+])
+def test_colored_formatter(level, prefix) -> None:
+    formatter = ColoredFormatter(fmt="[%(levelname)s] %(message)s")
+    record = logging.LogRecord("test", level, __file__, 1, "hello %s", ("world",), None)
+    suffix = ColoredFormatter.ANSI_RESET if prefix else ""
+
+    actual = formatter.format(record)
+
+    assert actual == f"{prefix}[{logging.getLevelName(level)}] hello world{suffix}"
+    assert formatter._style._fmt == "[%(levelname)s] %(message)s"
+
+
+def test_colored_formatter_level_colors_override() -> None:
+    class DebugFormatter(ColoredFormatter):
+        LEVEL_COLORS = {logging.DEBUG: "\u001b[36m"}
+
+    formatter = DebugFormatter(fmt="%(message)s")
+    debug = logging.LogRecord("test", logging.DEBUG, __file__, 1, "debug", None, None)
+    error = logging.LogRecord("test", logging.ERROR, __file__, 1, "error", None, None)
+
+    assert formatter.format(debug) == f"\u001b[36mdebug{ColoredFormatter.ANSI_RESET}"
+    assert formatter.format(error) == "error"
+
+
+def test_get_colored_logger_writes_from_listener(tmp_path) -> None:
+    adapter = get_colored_logger(scriptname="test_logs.py", log_dir=str(tmp_path), level=logging.DEBUG)
+    queue_handler, = adapter.logger.handlers
+
+    assert queue_handler.listener._thread is None
+
+    adapter.warning("hello %s", "world")
+    queue_handler.close()
+
+    log_file, = tmp_path.iterdir()
+    assert log_file.read_text().rstrip().endswith("[ WARNING]  hello world")
+
+
+def test_get_colored_logger_reuses_configuration(tmp_path) -> None:
+    first = get_colored_logger(scriptname="test_reuse.py", log_dir=str(tmp_path), persist=False)
+    second = get_colored_logger(scriptname="test_reuse.py", log_dir=str(tmp_path), persist=False)
+    reconfigured = get_colored_logger(scriptname="test_reuse.py", log_dir=str(tmp_path), level=logging.DEBUG, persist=False)
+
+    assert second is first
+    assert reconfigured is not first
+    assert len(reconfigured.logger.handlers) == 1
+    assert reconfigured.logger.level == logging.DEBUG
+
+
+def test_get_colored_logger_keeps_foreign_handlers_open(tmp_path) -> None:
+    get_colored_logger(scriptname="test_foreign.py", log_dir=str(tmp_path), persist=False)
+    foreign = logging.FileHandler(str(tmp_path / "foreign.log"))
+    logging.getLogger("test_foreign.py").addHandler(foreign)
+
+    get_colored_logger(scriptname="test_foreign.py", log_dir=str(tmp_path), level=logging.DEBUG, persist=False)
+
+    assert foreign.stream is not None
+    foreign.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_get_colored_logger_writes_after_fork(tmp_path) -> None:
+    adapter = get_colored_logger(scriptname="test_fork.py", log_dir=str(tmp_path), persist=True)
+    adapter.info("parent before fork")
+
+    child = os.fork()
+    if child == 0:
+        try:
+            forked = get_colored_logger(scriptname="test_fork.py", log_dir=str(tmp_path), persist=True)
+            forked.info("child after fork")
+            forked.logger.handlers[0].close()
+        finally:
+            os._exit(0)
+
+    os.waitpid(child, 0)
+    adapter.logger.handlers[0].close()
+
+    log_file, = tmp_path.iterdir()
+    contents = log_file.read_text()
+    assert "parent before fork" in contents
+    assert "child after fork" in contents
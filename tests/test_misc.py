@@ -1,10 +1,13 @@
 """Tests for the corvus.misc package."""
 
+import asyncio
 import logging
 import os
 import tempfile
 import pytest
+import xxhash
 
+from corvus import cmd
 from corvus import logs
 from corvus import misc
 
@@ -20,6 +23,317 @@ def test_get_xxhash():
     assert actual == expected
 
 
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_xxhash3():
+    expected = 'c6637589c0919ef6'  # XXH3 64-bit, as printed by `xxhsum -H3`
+    actual = misc.get_xxhash3("tests/lorem-ipsum.txt")
+
+    assert actual == expected
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@pytest.mark.parametrize("variant,expected", [
+    ("xxh32", "b06272a3"),
+    ("xxh64", "129376718c8b0d0d"),
+    ("xxh3_64", "c6637589c0919ef6"),
+])
+def test_get_xxhash_variants(variant, expected):
+    actual = misc.get_xxhash("tests/lorem-ipsum.txt", variant=variant)
+
+    assert actual == expected
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@pytest.mark.parametrize("variant,size,allow_mmap", [
+    ("xxh32", 3 * misc.XXHASH_ONESHOT_MAX + 123, False),  # streamed
+    ("xxh3_64", 3 * misc.XXHASH_ONESHOT_MAX + 123, False),
+    ("xxh32", misc.XXHASH_MMAP_MIN + 123, True),  # memory-mapped
+    ("xxh3_64", 3 * misc.XXHASH_MMAP_MIN + 123, True),
+])
+def test_get_xxhash_large_file(variant, size, allow_mmap):
+    data = os.urandom(size)
+    _, hexdigest = misc.XXHASH_VARIANTS[variant]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "large.bin")
+        with open(path, "wb") as file:
+            file.write(data)
+
+        actual = misc.get_xxhash(path, variant=variant, chunk_size=4096, allow_mmap=allow_mmap)
+
+    assert actual == hexdigest(data)
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_xxhash_memoized_by_stat():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "memo.txt")
+        with open(path, "w", encoding="ascii") as file:
+            file.write("first")
+        mtime = os.stat(path).st_mtime_ns - 10_000_000_000
+        os.utime(path, ns=(mtime, mtime))
+        first = misc.get_xxhash32(path)
+
+        ## Same size and (restored) mtime: the memoized digest is returned without reading the file
+        with open(path, "w", encoding="ascii") as file:
+            file.write("other")
+        os.utime(path, ns=(mtime, mtime))
+        assert misc.get_xxhash32(path) == first
+
+        os.utime(path, ns=(mtime + 1, mtime + 1))
+        assert misc.get_xxhash32(path) == xxhash.xxh32_hexdigest(b"other")
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_xxhash_bypasses_cache():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bypass.txt")
+        with open(path, "w", encoding="ascii") as file:
+            file.write("first")
+        mtime = os.stat(path).st_mtime_ns - 10_000_000_000
+        os.utime(path, ns=(mtime, mtime))
+        misc.get_xxhash3(path)
+
+        ## The stat stays the same, yet the file is read again
+        with open(path, "w", encoding="ascii") as file:
+            file.write("other")
+        os.utime(path, ns=(mtime, mtime))
+
+        assert misc.get_xxhash3(path, use_cache=False) == xxhash.xxh3_64_hexdigest(b"other")
+        assert misc.get_xxhash_many([path, path], use_cache=False) == {path: xxhash.xxh3_64_hexdigest(b"other")}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_xxhash_coarse_mtime_not_memoized(monkeypatch):
+    """A whole-second mtime may be a 2 s FAT timestamp: 1.5 s later, a same-size rewrite can still follow."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "coarse.txt")
+        with open(path, "w", encoding="ascii") as file:
+            file.write("coarse")
+        mtime = 5_000_000_000
+        os.utime(path, ns=(mtime, mtime))
+
+        monkeypatch.setattr(misc.time, "time_ns", lambda: mtime + 1_500_000_000)
+        misc.get_xxhash32(path)
+
+    assert (path, "xxh32") not in misc._HASH_CACHE
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_xxhash_fresh_file_not_memoized():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "fresh.txt")
+        with open(path, "w", encoding="ascii") as file:
+            file.write("fresh")
+
+        misc.get_xxhash32(path)
+
+    assert (path, "xxh32") not in misc._HASH_CACHE
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_xxhash32_many():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = [os.path.join(tmpdir, f"{i}.bin") for i in range(5)]
+        for i, path in enumerate(paths):
+            with open(path, "wb") as file:
+                file.write(os.urandom(i * misc.XXHASH_ONESHOT_MAX))
+        expected = {path: misc.get_xxhash32(path) for path in paths}
+
+        actual = misc.get_xxhash32_many(paths + paths[:1], workers=3)
+
+    assert actual == expected
+    assert list(actual) == paths
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_get_xxhash_unknown_variant():
+    with pytest.raises(ValueError):
+        misc.get_xxhash("tests/lorem-ipsum.txt", variant="md5")
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@pytest.mark.parametrize("qtask_id,expected", [
+    ("job-42_ü", "106-111-98-45-52-50-95-252"),
+    ("€uro", "8364-117-114-111"),  # beyond a single byte
+])
+def test_qtask_id_roundtrip(qtask_id, expected):
+    encoded = misc.qtask_id2ascii(qtask_id)
+
+    assert encoded == expected
+    assert misc.ascii2qtask_id(encoded) == qtask_id
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+@pytest.mark.parametrize("backend", ["pygit2", "git"])
+def test_current_git_commit(monkeypatch, backend):
+    if backend == "pygit2":
+        pytest.importorskip("pygit2")
+    else:
+        optional_module = misc._optional_module
+        monkeypatch.setattr(misc, "_optional_module", lambda name: None if name == "pygit2" else optional_module(name))
+
+    for var in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(var, "corvus")
+    for var in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(var, "corvus@localhost")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        git = f"git -C {tmpdir}"
+        cmd.get_cmd_output(f"{git} init -q -b main")
+        cmd.get_cmd_output(f"{git} commit -q --allow-empty -m first")
+        cmd.get_cmd_output(f"{git} tag -a v1.0 -m v1.0")
+        cmd.get_cmd_output(f"{git} commit -q --allow-empty -m second")
+        abbrev = cmd.get_cmd_output(f"{git} rev-parse --short HEAD")["stdout"]
+
+        actual = misc.current_git_commit(tmpdir)
+        misc._GIT_CACHE.clear()
+        actual_async = asyncio.run(misc.current_git_commit_async(tmpdir))
+
+        ## A new commit must invalidate the cached result
+        cmd.get_cmd_output(f"{git} commit -q --allow-empty -m third")
+        abbrev_new = cmd.get_cmd_output(f"{git} rev-parse --short HEAD")["stdout"]
+        actual_new = misc.current_git_commit(tmpdir)
+
+    assert actual == {"commit": f"v1.0-1-g{abbrev}", "branch": "main"}
+    assert actual_async == actual
+    assert actual_new == {"commit": f"v1.0-2-g{abbrev_new}", "branch": "main"}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_current_git_commit_backends_agree_on_core_abbrev(monkeypatch):
+    pytest.importorskip("pygit2")
+    for var in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(var, "corvus")
+    for var in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(var, "corvus@localhost")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        git = f"git -C {tmpdir}"
+        cmd.get_cmd_output(f"{git} init -q -b main")
+        cmd.get_cmd_output(f"{git} config core.abbrev 12")
+        cmd.get_cmd_output(f"{git} commit -q --allow-empty -m first")
+        abbrev = cmd.get_cmd_output(f"{git} rev-parse --short HEAD")["stdout"]
+
+        ## The async variant always runs git: it must neither serve nor be served the pygit2 result
+        via_pygit2 = misc.current_git_commit(tmpdir)
+        via_git = asyncio.run(misc.current_git_commit_async(tmpdir))
+
+    assert len(abbrev) == 12
+    assert via_pygit2 == via_git == {"commit": abbrev, "branch": "main"}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_current_git_commit_without_describe_placeholder(monkeypatch):
+    ## Git older than 2.32 prints "%(describe)" verbatim, which "%%(describe)" reproduces
+    get_cmd_output = cmd.get_cmd_output
+
+    def old_git_cmd_output(argv, **kwargs):
+        if isinstance(argv, list):
+            argv = [arg.replace("%(describe)", "%%(describe)") for arg in argv]
+        return get_cmd_output(argv, **kwargs)
+
+    optional_module = misc._optional_module
+    monkeypatch.setattr(misc, "_optional_module", lambda name: None if name == "pygit2" else optional_module(name))
+    monkeypatch.setattr(misc.cmd, "get_cmd_output", old_git_cmd_output)
+    for var in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(var, "corvus")
+    for var in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(var, "corvus@localhost")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        git = f"git -C {tmpdir}"
+        get_cmd_output(f"{git} init -q -b main")
+        get_cmd_output(f"{git} commit -q --allow-empty -m first")
+        abbrev = get_cmd_output(f"{git} rev-parse --short HEAD")["stdout"]
+        untagged = misc.current_git_commit(tmpdir)
+
+        get_cmd_output(f"{git} tag -a v1.0 -m v1.0")
+        get_cmd_output(f"{git} commit -q --allow-empty -m second")
+        abbrev_new = get_cmd_output(f"{git} rev-parse --short HEAD")["stdout"]
+        tagged = misc.current_git_commit(tmpdir)
+
+    assert untagged == {"commit": abbrev, "branch": "main"}
+    assert tagged == {"commit": f"v1.0-1-g{abbrev_new}", "branch": "main"}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_current_git_commit_ignores_show_signature(monkeypatch):
+    if cmd.get_cmd_output("command -v ssh-keygen")["rc"] != 0:
+        pytest.skip("ssh-keygen is not available")
+
+    optional_module = misc._optional_module
+    monkeypatch.setattr(misc, "_optional_module", lambda name: None if name == "pygit2" else optional_module(name))
+    for var in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(var, "corvus")
+    for var in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(var, "corvus@localhost")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        git = f"git -C {tmpdir}"
+        key = os.path.join(tmpdir, ".key")
+        cmd.get_cmd_output(f"ssh-keygen -q -t ed25519 -N '' -f {key}")
+        cmd.get_cmd_output(f"{git} init -q -b main")
+        cmd.get_cmd_output(f"{git} -c gpg.format=ssh -c user.signingkey={key} commit -q -S --allow-empty -m signed")
+        abbrev = cmd.get_cmd_output(f"{git} rev-parse --short HEAD")["stdout"]
+
+        ## As if set in the user's ~/.gitconfig: the signature check would print ahead of the format
+        monkeypatch.setenv("GIT_CONFIG_COUNT", "1")
+        monkeypatch.setenv("GIT_CONFIG_KEY_0", "log.showSignature")
+        monkeypatch.setenv("GIT_CONFIG_VALUE_0", "true")
+        actual = misc.current_git_commit(tmpdir)
+
+    assert actual == {"commit": abbrev, "branch": "main"}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_parse_git_log_skips_leading_output():
+    log = {"rc": 0, "stdout": "No signature\n\x00abc1234\x00v1.0-1-gabc1234\x00HEAD -> main, tag: v0.9", "stderr": ""}
+
+    assert misc._parse_git_log(log, "/repo") == {"commit": "v1.0-1-gabc1234", "branch": "main"}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_current_git_commit_notices_nested_tag(monkeypatch):
+    for var in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(var, "corvus")
+    for var in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(var, "corvus@localhost")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        git = f"git -C {tmpdir}"
+        cmd.get_cmd_output(f"{git} init -q -b main")
+        cmd.get_cmd_output(f"{git} commit -q --allow-empty -m first")
+        cmd.get_cmd_output(f"{git} tag -a release/v1 -m v1")
+        cmd.get_cmd_output(f"{git} commit -q --allow-empty -m second")
+        abbrev = cmd.get_cmd_output(f"{git} rev-parse --short HEAD")["stdout"]
+        before = misc.current_git_commit(tmpdir)
+
+        ## Only refs/tags/release/ changes, not refs/tags itself
+        cmd.get_cmd_output(f"{git} tag -a release/v2 -m v2")
+        after = misc.current_git_commit(tmpdir)
+
+    assert before["commit"] == f"release/v1-1-g{abbrev}"
+    assert after["commit"] == "release/v2"
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_git_state_key_skips_reftable():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cmd.get_cmd_output(["git", "-C", tmpdir, "init", "-q"])
+        assert misc._git_state_key(tmpdir) is not None
+
+        os.mkdir(os.path.join(tmpdir, ".git", "reftable"))
+        assert misc._git_state_key(tmpdir) is None
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_current_git_commit_raises_notagitrepository():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with pytest.raises(misc.NotAGitRepository):
+            misc.current_git_commit(tmpdir)
+
+
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def test_discover_config_from_env(monkeypatch):
     monkeypatch.setenv("TEST_CONFIG", "tests")
@@ -48,6 +362,29 @@ def test_discover_config_from_env_malformed(monkeypatch):
         misc.discover_config(name="test_malformed", logger=logger)
 
 
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_discover_config_not_an_object():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "array.cfg.json"), "w", encoding="utf-8") as file:
+            file.write('["topicA", "topicB"]')
+
+        with pytest.raises(misc.BadConfigurationFile):
+            misc.discover_config(name="array", logger=logger, dir_=tmpdir)
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_discover_config_malformed_parsed_once(monkeypatch):
+    monkeypatch.setenv("TEST_MALFORMED_CONFIG", "tests")
+    with pytest.raises(misc.BadConfigurationFile):
+        misc.discover_config(name="test_malformed", logger=logger)
+    hits = misc._load_config.cache_info().hits
+
+    with pytest.raises(misc.BadConfigurationFile):
+        misc.discover_config(name="test_malformed", logger=logger)
+
+    assert misc._load_config.cache_info().hits == hits + 1
+
+
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def test_discover_config_from_env_empty(monkeypatch):
     monkeypatch.setenv("TEST_EMPTY_CONFIG", "tests")
@@ -67,6 +404,115 @@ def test_discover_config():
     assert actual == expected
 
 
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_discover_config_reloads_modified_file():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "reload.cfg.json")
+
+        with open(path, "w", encoding="utf-8") as file:
+            file.write('{"version": 1}')
+        assert misc.discover_config(name="reload", logger=logger, dir_=tmpdir) == {"version": 1}
+
+        with open(path, "w", encoding="utf-8") as file:
+            file.write('{"version": 2}')
+        mtime = os.stat(path).st_mtime_ns + 1_000_000_000
+        os.utime(path, ns=(mtime, mtime))
+
+        assert misc.discover_config(name="reload", logger=logger, dir_=tmpdir) == {"version": 2}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_discover_config_reloads_rewrite_with_same_mtime():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "rewrite.cfg.json")
+
+        with open(path, "w", encoding="utf-8") as file:
+            file.write('{"version": 1}')
+        mtime = os.stat(path).st_mtime_ns
+        assert misc.discover_config(name="rewrite", logger=logger, dir_=tmpdir) == {"version": 1}
+
+        with open(path, "w", encoding="utf-8") as file:
+            file.write('{"version": 10}')
+        os.utime(path, ns=(mtime, mtime))
+
+        assert misc.discover_config(name="rewrite", logger=logger, dir_=tmpdir) == {"version": 10}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_discover_config_returns_private_copies():
+    first = misc.discover_config(name="test", logger=logger, dir_="tests")
+    first["topicA"]["a"] = 42
+    first.pop("topicB")
+
+    assert misc.discover_config(name="test", logger=logger, dir_="tests") == {
+        "topicA": {"a": 0},
+        "topicB": {"b": 1}
+    }
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_discover_config_prefers_dir_over_env(monkeypatch):
+    with tempfile.TemporaryDirectory() as dir_, tempfile.TemporaryDirectory() as env_dir:
+        for location, origin in ((dir_, "dir"), (env_dir, "env")):
+            with open(os.path.join(location, "order.cfg.json"), "w", encoding="utf-8") as file:
+                file.write(f'{{"origin": "{origin}"}}')
+        monkeypatch.setenv("ORDER_CONFIG", env_dir)
+
+        actual = misc.discover_config(name="order", logger=logger, dir_=dir_)
+
+    assert actual == {"origin": "dir"}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_discover_config_picks_up_new_file_of_higher_precedence(monkeypatch):
+    with tempfile.TemporaryDirectory() as dir_, tempfile.TemporaryDirectory() as env_dir:
+        monkeypatch.setenv("LATE_CONFIG", env_dir)
+        with open(os.path.join(env_dir, "late.cfg.json"), "w", encoding="utf-8") as file:
+            file.write('{"origin": "env"}')
+        assert misc.discover_config(name="late", logger=logger, dir_=dir_) == {"origin": "env"}
+
+        with open(os.path.join(dir_, "late.cfg.json"), "w", encoding="utf-8") as file:
+            file.write('{"origin": "dir"}')
+
+        assert misc.discover_config(name="late", logger=logger, dir_=dir_) == {"origin": "dir"}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_discover_config_skips_unreadable_file(monkeypatch):
+    with tempfile.TemporaryDirectory() as dir_, tempfile.TemporaryDirectory() as env_dir:
+        for location, origin in ((dir_, "dir"), (env_dir, "env")):
+            with open(os.path.join(location, "locked.cfg.json"), "w", encoding="utf-8") as file:
+                file.write(f'{{"origin": "{origin}"}}')
+        monkeypatch.setenv("LOCKED_CONFIG", env_dir)
+
+        ## Root reads files regardless of their mode: deny access to the first one by hand
+        locked = os.path.realpath(os.path.join(dir_, "locked.cfg.json"))
+
+        def open_unless_locked(path, *args, **kwargs):
+            if path == locked:
+                raise PermissionError(13, "Permission denied", path)
+            return open(path, *args, **kwargs)
+        monkeypatch.setattr(misc, "open", open_unless_locked, raising=False)
+
+        actual = misc.discover_config(name="locked", logger=logger, dir_=dir_)
+
+    assert actual == {"origin": "env"}
+
+
+## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
+def test_log_obj_instantiation_reports_missing_pid_once(caplog):
+    class Pidless:
+        pass
+
+    with caplog.at_level(logging.DEBUG, logger=logger.logger.name):
+        misc.log_obj_instantiation(Pidless(), logger=logger)
+        misc.log_obj_instantiation(Pidless(), logger=logger, addendum="Again.")
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages.count("Class interface lacks the ``pid`` property: 'Pidless'") == 1
+    assert messages[-1].endswith("pid=None. Again.")
+
+
 ## ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ---- ##
 def test_purge_dir_contents():
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -115,12 +561,40 @@ def test_purge_dir_contents_no_follow_symlinks() -> None:
         assert os.path.exists(file_path)
 
 
+@pytest.mark.parametrize("kwargs,expected", [
+    ({}, "\u001b[31mtext\u001b[0m"),
+    ({"bright": True}, "\u001b[31;1mtext\u001b[0m"),
+    ({"bright": True, "bold": True, "reverse": True}, "\u001b[31;1m\u001b[1m\u001b[7mtext\u001b[0m"),
+])
+def test_colorize(kwargs, expected) -> None:
+    actual = misc.colorize("text", "red", **kwargs)
+
+    assert actual == expected
+
+
+def test_colorize_bytes() -> None:
+    expected = misc.colorize("text", "cyan", bright=True, bold=True).encode("ascii")
+
+    actual = misc.colorize_bytes(b"text", "cyan", bright=True, bold=True)
+
+    assert actual == expected
+
+
 def test_get_bin_version_ok() -> None:
     actual = bool(misc.get_bin_version("/bin/ps", logger=logger))
 
     assert actual is True
 
 
+def test_get_bin_version_cached(monkeypatch) -> None:
+    expected = misc.get_bin_version("/bin/ps", logger=logger)
+    monkeypatch.setattr(misc.cmd, "get_cmd_output", lambda *args, **kwargs: pytest.fail("binary was called again"))
+
+    actual = misc.get_bin_version("/bin/ps", logger=logger)
+
+    assert actual == expected
+
+
 def test_get_bin_version_raises_filenotfounderror() -> None:
     with pytest.raises(FileNotFoundError):
         misc.get_bin_version("/bin/non-existent", logger=logger)
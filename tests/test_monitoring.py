@@ -1,47 +1,256 @@
 """Tests for the corvus.monitoring package."""
 
+import asyncio
+import functools
 import os
 import tempfile
-import threading
 import time
-from datetime import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
+from corvus import monitoring
 from corvus.monitoring import has_stabilized_hash
 
 
-def keep_file_changing(filename: str, period: float, cycles: int) -> None:
-    for _ in range(0, cycles):
-        with open(filename, "w") as file:
-            file.write(dt.strftime(dt.now(), "%Y-%m-%d %H:%M:%S.%f"))
-        time.sleep(period)
+## Keep the files under watch in memory (tmpfs) where available, away from disk writeback jitter
+TMP_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+async def keep_file_changing(filename: str, period: float, cycles: int) -> None:
+    ## One descriptor for all cycles: each rewrite is a positioned write, then a cut of any leftover tail
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    try:
+        for _ in range(0, cycles):
+            data = b"%d" % time.monotonic_ns()
+            os.pwrite(fd, data, 0)
+            os.ftruncate(fd, len(data))
+            await asyncio.sleep(period)
+    finally:
+        os.close(fd)
+
+
+async def watch_changing_file(pool: ThreadPoolExecutor, filename: str, keep_seconds: int, max_seconds: int) -> bool:
+    """Keep rewriting the file on the event loop while `has_stabilized_hash` watches it from a pooled thread."""
+    watch = functools.partial(has_stabilized_hash, filename, max_seconds, use_inotify=True)
+    watching = asyncio.get_running_loop().run_in_executor(pool, watch)
+    _, stabilized = await asyncio.gather(keep_file_changing(filename, 0.5, keep_seconds), watching)
+    return stabilized
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+@pytest.fixture(scope="module")
+def watcher_pool():
+    """A single worker thread shared by all cases (asyncio.run would start a fresh default executor for each)."""
+    pool = ThreadPoolExecutor(max_workers=1)
+    yield pool
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+def write_clock_reading(filename: str, at_ns: int) -> None:
+    with open(filename, "w", encoding="ascii") as file:
+        file.write(str(at_ns))
+
+
+class FakeClock:
+    """
+    Stand-in for the `time` module of corvus.monitoring: sleeping advances a virtual clock at once,
+    performing the rewrites of the file that fall due in the meantime (stamped with their virtual mtime).
+    """
+
+    def __init__(self, filename: str, period: float, cycles: int, rewrite=write_clock_reading):
+        self.filename = filename
+        self.rewrite = rewrite
+        self.now_ns = time.time_ns()
+        self.due = [self.now_ns + round(cycle * period * 1e9) for cycle in range(cycles)]
+        self.sleep(0)
+
+    def sleep(self, seconds: float) -> None:
+        target_ns = self.now_ns + round(seconds * 1e9)
+        while self.due and self.due[0] <= target_ns:
+            self.now_ns = self.due.pop(0)
+            self.rewrite(self.filename, self.now_ns)
+            os.utime(self.filename, ns=(self.now_ns, self.now_ns))
+        self.now_ns = target_ns
+
+    def time_ns(self) -> int:
+        return self.now_ns
+
+    def monotonic(self) -> float:
+        return self.now_ns / 1e9
 
 
 ## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
-@pytest.mark.parametrize("keep_seconds,max_seconds,expected", [
+CASES = [
     (2, 3, True),  # enough time to see hash stabilize
     (3, 2, False),  # not enough time to see hash stabilize
     (2, 2, False),  # an edge case
     (3, -1, True),  # test with no limit for waiting time
-])
-def test_has_stabilized_hash(keep_seconds, max_seconds, expected):
+]
+
+
+@pytest.mark.parametrize("keep_seconds,max_seconds,expected", CASES)
+def test_has_stabilized_hash(monkeypatch, keep_seconds, max_seconds, expected):
     """
     Mock a file in transit by creating a file and writing to it for a set number of seconds,
 
-    Writes current date with milliseconds to a temporary file every 500 ms in a separate thread.
+    Writes the (virtual) time to a temporary file every 500 ms: the polling loop runs on a fake clock.
     :param keep_seconds: how long to keep the file under changes
     :param max_seconds: wait for the hash to stabilize at most this many seconds
     :param expected: the boolean value that the function is supposed to return
     """
-    with tempfile.TemporaryDirectory() as tmpdir:
+    monkeypatch.setattr(monitoring, "_inotify_simple", lambda: None)
+
+    with tempfile.TemporaryDirectory(dir=TMP_ROOT) as tmpdir:
         filename = os.path.join(tmpdir, "hashtest.txt")
         open(filename, 'a', encoding="ascii").close()
 
-        thread = threading.Thread(target=keep_file_changing, args=(filename, 0.5, keep_seconds))
-        thread.daemon = True
-        thread.start()
-
+        monkeypatch.setattr(monitoring, "time", FakeClock(filename, 0.5, keep_seconds))
         actual = has_stabilized_hash(filename=filename, max_seconds=max_seconds)
 
     assert expected == actual
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+@pytest.mark.parametrize("keep_seconds,max_seconds,expected", CASES)
+def test_has_stabilized_hash_inotify(watcher_pool, keep_seconds, max_seconds, expected):
+    """
+    Same cases in real time, for the inotify backend (which waits in the kernel, not on the clock).
+
+    Writes a monotonic clock reading in nanoseconds to a temporary file every 500 ms from an asyncio task.
+    """
+    if monitoring._inotify_simple() is None:
+        pytest.skip("inotify_simple is not available")
+
+    with tempfile.TemporaryDirectory(dir=TMP_ROOT) as tmpdir:
+        filename = os.path.join(tmpdir, "hashtest.txt")
+        open(filename, 'a', encoding="ascii").close()
+
+        actual = asyncio.run(watch_changing_file(watcher_pool, filename, keep_seconds, max_seconds))
+
+    assert expected == actual
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+def test_has_stabilized_hash_polls_by_default(monkeypatch):
+    """The inotify backend is opt-in: without `use_inotify` it is never looked up."""
+    def fail():
+        raise AssertionError("inotify must not be used by default")
+    monkeypatch.setattr(monitoring, "_inotify_simple", fail)
+
+    with tempfile.TemporaryDirectory(dir=TMP_ROOT) as tmpdir:
+        filename = os.path.join(tmpdir, "hashtest.txt")
+        open(filename, 'a', encoding="ascii").close()
+
+        monkeypatch.setattr(monitoring, "time", FakeClock(filename, 0.5, 0))
+        assert has_stabilized_hash(filename=filename, max_seconds=3)
+
+
+def test_has_stabilized_events_treats_overflow_as_change():
+    """An overflowed inotify queue carries no file name, yet may hide events for the file under watch."""
+    inotify_simple = monitoring._inotify_simple()
+    if inotify_simple is None:
+        pytest.skip("inotify_simple is not available")
+
+    class OverflowingINotify:
+        def add_watch(self, path, mask):
+            return 1
+
+        def read(self, timeout=None):
+            time.sleep(timeout / 1000)
+            return [inotify_simple.Event(wd=-1, mask=inotify_simple.flags.Q_OVERFLOW, cookie=0, name="")]
+
+    with tempfile.TemporaryDirectory(dir=TMP_ROOT) as tmpdir:
+        filename = os.path.join(tmpdir, "hashtest.txt")
+        open(filename, 'a', encoding="ascii").close()
+
+        actual = monitoring._has_stabilized_events(OverflowingINotify(), inotify_simple.flags, filename, 2, None)
+
+    assert actual is False
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+def test_has_stabilized_hash_skips_hashing_unchanged_file(monkeypatch):
+    """Once the size and a settled mtime repeat, the answer is known without hashing the file again."""
+    monkeypatch.setattr(monitoring, "_inotify_simple", lambda: None)
+    hashed = []
+    monkeypatch.setattr(monitoring, "get_xxhash3", lambda filename, **kwargs: hashed.append(filename) or "digest")
+
+    with tempfile.TemporaryDirectory(dir=TMP_ROOT) as tmpdir:
+        filename = os.path.join(tmpdir, "settled.txt")
+        with open(filename, "w", encoding="ascii") as file:
+            file.write("settled")
+        mtime = os.stat(filename).st_mtime_ns - 10_000_000_000
+        os.utime(filename, ns=(mtime, mtime))
+
+        monkeypatch.setattr(monitoring, "time", FakeClock(filename, 1, 0))
+        actual = has_stabilized_hash(filename=filename, max_seconds=3)
+
+    assert actual is True
+    assert hashed == [filename]
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+@pytest.mark.parametrize("mtime_ns,checked_ns,expected", [
+    (5_000_000_000, 6_500_000_000, False),  # whole seconds: may be a 2 s FAT timestamp
+    (5_000_000_000, 7_000_000_000, True),
+    (5_000_000_001, 5_020_000_000, True),  # fine-grained: a kernel tick is enough
+])
+def test_mtime_settled(mtime_ns, checked_ns, expected):
+    assert monitoring._mtime_settled(mtime_ns, checked_ns) is expected
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+class ReplacingClock(FakeClock):
+    """Replace the file by a rename on every sleep, with new contents of the same size and the same old mtime."""
+
+    def __init__(self, filename: str, mtime_ns: int):
+        self.mtime_ns = mtime_ns
+        self.replacements = 0
+        super().__init__(filename, 1, 0)
+
+    def sleep(self, seconds: float) -> None:
+        staged = f"{self.filename}.part"
+        with open(staged, "w", encoding="ascii") as file:
+            file.write(f"{self.replacements:05d}")
+        os.utime(staged, ns=(self.mtime_ns, self.mtime_ns))
+        os.replace(staged, self.filename)
+        self.replacements += 1
+        super().sleep(seconds)
+
+
+def test_has_stabilized_hash_notices_rename_replace(monkeypatch):
+    """A replacement with the same size and a settled, unchanged mtime is still a different file."""
+    monkeypatch.setattr(monitoring, "_inotify_simple", lambda: None)
+
+    with tempfile.TemporaryDirectory(dir=TMP_ROOT) as tmpdir:
+        filename = os.path.join(tmpdir, "replaced.txt")
+
+        monkeypatch.setattr(monitoring, "time", ReplacingClock(filename, time.time_ns() - 10_000_000_000))
+        actual = has_stabilized_hash(filename=filename, max_seconds=3)
+
+    assert actual is False
+
+
+## ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ==== ##
+def test_has_stabilized_hash_prefilters_large_rewrites(monkeypatch):
+    """Same-size rewrites of a large file that change its head are told apart without hashing."""
+    monkeypatch.setattr(monitoring, "_inotify_simple", lambda: None)
+    hashed = []
+    monkeypatch.setattr(monitoring, "get_xxhash3", lambda filename, **kwargs: hashed.append(filename) or "digest")
+
+    with tempfile.TemporaryDirectory(dir=TMP_ROOT) as tmpdir:
+        filename = os.path.join(tmpdir, "large.bin")
+        with open(filename, "wb") as file:
+            file.write(os.urandom(monitoring.EDGE_CHECK_MIN_SIZE))
+
+        def rewrite_head(filename: str, _at_ns: int) -> None:
+            with open(filename, "r+b") as file:
+                file.write(os.urandom(monitoring.EDGE_BYTES))
+
+        monkeypatch.setattr(monitoring, "time", FakeClock(filename, 1, 3, rewrite=rewrite_head))
+        actual = has_stabilized_hash(filename=filename, max_seconds=3)
+
+    assert actual is False
+    assert hashed == [filename]